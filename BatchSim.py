@@ -0,0 +1,297 @@
+from Deals import generate_deals, deal_mask_tuples
+from Engine import GameEngine
+from Rules import POINT_LIMIT
+from Player import Player
+from Bitmask import DISPLAY_ORDER
+import numpy as np
+import argparse
+import time
+
+# plays thousands of bot games side by side with numpy, every game in a batch plays the same trick of the same hand at the same time
+# difficulties 0-2 are supported as they are simple enough to work out with array operations, and difficulty 5 (see Learned.py)
+# which scores the cards of every game in the batch at once
+# the cards chosen are exactly the ones Bot.make_choice would choose, so each game gives the same result as GameEngine
+# with the same deals and random numbers (see scalar_engine)
+#
+# hands are (games, 4, 52) boolean arrays indexed by card index (see Bitmask.py), cards played are card indexes
+
+# difficulties the simulator can play
+DIFFICULTIES = (0, 1, 2, 5)
+
+# number of random numbers added for each game when a game runs out
+UNIFORM_BLOCK = 64
+
+INDEXES = np.arange(52, dtype=np.int16)
+VALUES = INDEXES % 13 + 2
+HEARTS = INDEXES >= 39
+QS_INDEX = 36
+ROUND_1_BANNED = HEARTS | (INDEXES == QS_INDEX)
+
+# boolean masks of each suit, in suit number order (clubs, diamonds, spades, hearts)
+SUIT_MASKS = np.array([INDEXES // 13 == suit for suit in range(4)])
+
+# make_choice sorts the legal cards by value, keeping the display order of spades, hearts, diamonds then clubs for cards of the same value
+# so the first card of a value is the spade and the last is the club
+# ORDER_KEY ranks the cards in that order, its lowest is the card make_choice picks as lowest and its highest the card picked as highest
+SUIT_PREFERENCE = np.array([3, 2, 0, 1])[INDEXES // 13]
+ORDER_KEY = VALUES * 4 + SUIT_PREFERENCE
+
+# card indexes in the order make_choice lists them, which difficulty 0 picks from
+DISPLAY = np.array(DISPLAY_ORDER)
+
+# the lowest legal card of each game as make_choice picks it
+def lowest_cards(valid):
+    return np.where(valid, ORDER_KEY, ORDER_KEY.max() + 1).argmin(axis=1)
+
+# random source for GameEngine which makes the same difficulty 0 choices as the simulator, from one game's row of uniforms
+class UniformRandom():
+    # initialise with the random numbers in [0, 1) to use in order
+    def __init__(self, uniforms):
+        self.uniforms = iter(uniforms.tolist())
+
+    # pick an item the same way the simulator does
+    def choice(self, seq):
+        return seq[int(next(self.uniforms) * len(seq))]
+
+# a batch of games between bots with the same difficulties in the same seats
+class BatchSimulator():
+    # initialise the batch, seats is the difficulty of each of the 4 seats
+    # model is the Learned.LearnedModel used by difficulty 5, the default weights are loaded if it isn't given
+    # rules is a Rules.Variant whose point limit is used instead of point_limit, the standard play is built into the array
+    # operations so only a variant which plays and scores cards as the standard game without passing can be simulated
+    def __init__(self, games, seats, seed=None, point_limit=POINT_LIMIT, model=None, rules=None):
+        if len(seats) != 4 or any(difficulty not in DIFFICULTIES for difficulty in seats):
+            raise ValueError(f'seats must be 4 difficulties out of {", ".join(map(str, DIFFICULTIES))}')
+        if rules is not None:
+            if not rules.standard_play or rules.passing:
+                raise ValueError(f'the batch simulator only plays the standard rules, not {rules.describe()}')
+            point_limit = rules.point_limit
+
+        self.games = games
+        self.seats = np.array(seats)
+        self.point_limit = point_limit
+
+        self.model = model
+        if model is None and 5 in seats:
+            from Learned import get_model
+            self.model = get_model()
+
+        # deals and difficulty 0 choices come from separate streams so one doesn't change the other
+        deal_seed, choice_seed = np.random.SeedSequence(seed).spawn(2)
+        self.deal_rng = np.random.default_rng(deal_seed)
+        self.choice_rng = np.random.default_rng(choice_seed)
+
+        # every game's deals, one (games, 4, 13) array for each hand, and random numbers for difficulty 0 and how many each game has used
+        self.deals = []
+        self.uniforms = np.empty((games, 0))
+        self.used = np.zeros(games, dtype=np.int64)
+
+        self.points = np.zeros((games, 4), dtype=np.int64)
+        self.hands_played = np.zeros(games, dtype=np.int64)
+
+    # play every game to the point limit, returns the points of every game as a (games, 4) array
+    def run(self):
+        active = np.arange(self.games)
+        while len(active):
+            self.play_hand(active)
+            active = active[self.points[active].max(axis=1) < self.point_limit]
+        return self.points
+
+    # a (games, 4) boolean array of the winners of each game, everyone on the lowest points
+    def winners(self):
+        return self.points == self.points.min(axis=1, keepdims=True)
+
+    # deal a new hand to every game and play it in the given games
+    def play_hand(self, active):
+        deals = generate_deals(self.games, rng=self.deal_rng)
+        self.deals.append(deals)
+
+        n = len(active)
+        rows = np.arange(n)
+        hands = np.zeros((n, 4, 52), dtype=bool)
+        np.put_along_axis(hands, deals[active].astype(np.intp), True, axis=2)
+
+        # the player with the 2 of clubs leads first
+        leader = hands[:, :, 0].argmax(axis=1)
+        heart_broken = np.zeros(n, dtype=bool)
+        taken = np.zeros((n, 4), dtype=np.int64)
+
+        for round_num in range(1, 14):
+            trick = np.empty((n, 4), dtype=np.intp)
+
+            for position in range(4):
+                seat = (leader + position) % 4
+                hand = hands[rows, seat]
+
+                # the 2 of clubs is played automatically to start the hand
+                if round_num == 1 and position == 0:
+                    card = np.zeros(n, dtype=np.intp)
+                else:
+                    valid = self.legal_moves(hand, round_num, trick[:, 0] // 13 if position else None, heart_broken)
+                    card = self.choose(active, seat, valid, trick[:, :position], (hands, taken, heart_broken, round_num))
+
+                hands[rows, seat, card] = False
+                trick[:, position] = card
+                heart_broken |= card >= 39
+
+            # the highest card of the lead suit wins the trick and its points
+            lead = trick[:, :1] // 13
+            winner = (leader + np.where(trick // 13 == lead, trick, -1).argmax(axis=1)) % 4
+            taken[rows, winner] += (trick >= 39).sum(axis=1) + 13 * (trick == QS_INDEX).any(axis=1)
+            leader = winner
+
+        # if someone shot the moon everyone else gets 26 points
+        moon = taken == 26
+        self.points[active] += np.where(moon.any(axis=1, keepdims=True), 26 * ~moon, taken)
+        self.hands_played[active] += 1
+
+    # legal cards for a (n, 52) array of hands, the same rules as Rules.legal_moves
+    # lead_suit is an array of suit numbers, or None when leading
+    def legal_moves(self, hand, round_num, lead_suit, heart_broken):
+        moves = hand
+
+        # a card matching the lead suit must be played if one is available
+        if lead_suit is not None:
+            following = hand & SUIT_MASKS[lead_suit]
+            moves = np.where(following.any(axis=1, keepdims=True), following, hand)
+
+        # no hearts or the queen of spades on round 1, unless there is nothing else
+        if round_num == 1:
+            allowed = moves & ~ROUND_1_BANNED
+            moves = np.where(allowed.any(axis=1, keepdims=True), allowed, moves)
+
+        # hearts can't be led before they are broken, unless only hearts are left
+        if lead_suit is None:
+            allowed = moves & ~HEARTS
+            moves = np.where((allowed.any(axis=1) & ~heart_broken)[:, None], allowed, moves)
+
+        return moves
+
+    # choose a card for each game with the policy of the seat's difficulty, trick is the cards played so far this trick
+    # state is the hands, points taken, hearts broken and round number of the hand, which only difficulty 5 needs
+    # each policy only works on the games where it is used
+    def choose(self, active, seat, valid, trick, state):
+        difficulty = self.seats[seat]
+        card = np.empty(len(valid), dtype=np.intp)
+
+        # 1 plays the lowest card
+        rows = difficulty == 1
+        if rows.any():
+            card[rows] = lowest_cards(valid[rows])
+
+        # 2 plays the lowest card when leading, the highest card if it can't follow suit,
+        # otherwise the highest card below the trick's highest card or the lowest card if it has none
+        rows = difficulty == 2
+        if rows.any():
+            card[rows] = self.careful_cards(valid[rows], trick[rows])
+
+        # 5 scores every legal card of every game with the learned model
+        rows = difficulty == 5
+        if rows.any():
+            card[rows] = self.learned_cards(active[rows], seat[rows], valid[rows], trick[rows], [value[rows] for value in state[:3]] + [state[3]])
+
+        # 0 picks a random legal card from the list in display order
+        rows = difficulty == 0
+        if rows.any():
+            uniforms = self.next_uniforms(active[rows])
+            valid_display = valid[rows][:, DISPLAY]
+            pick = (uniforms * valid_display.sum(axis=1)).astype(np.intp)
+            card[rows] = DISPLAY[(valid_display.cumsum(axis=1) > pick[:, None]).argmax(axis=1)]
+
+        return card
+
+    # cards difficulty 2 plays
+    def careful_cards(self, valid, trick):
+        lowest = lowest_cards(valid)
+        if not trick.shape[1]:
+            return lowest
+
+        lead = trick[:, 0] // 13
+        void = ~(valid & SUIT_MASKS[lead]).any(axis=1)
+        winning = np.where(trick // 13 == lead[:, None], trick, -1).max(axis=1)
+        below = valid & (INDEXES < winning[:, None])
+        highest_below = np.where(below, INDEXES, -1).argmax(axis=1)
+        highest = np.where(valid, ORDER_KEY, -1).argmax(axis=1)
+        return np.where(void, highest, np.where(below.any(axis=1), highest_below, lowest))
+
+    # cards difficulty 5 plays, the features of each game are worked out from the seat's point of view
+    def learned_cards(self, games, seat, valid, trick, state):
+        from Learned import card_features
+        hands, taken, heart_broken, round_num = state
+        rows = np.arange(len(seat))[:, None]
+        order = (seat[:, None] + np.arange(4)) % 4
+
+        full_trick = np.full((len(seat), 4), -1)
+        full_trick[:, :trick.shape[1]] = trick
+
+        # every card not in a hand has been played this hand
+        features = card_features(hands[rows[:, 0], seat], ~hands.any(axis=1), full_trick, taken[rows, order], self.points[games][rows, order],
+                                 heart_broken, round_num, self.point_limit)
+        return self.model.choose(features, valid)
+
+    # the next random number of each of the given games, more are drawn for every game when one runs out
+    def next_uniforms(self, games):
+        while self.used[games].max() >= self.uniforms.shape[1]:
+            self.uniforms = np.concatenate((self.uniforms, self.choice_rng.random((self.games, UNIFORM_BLOCK))), axis=1)
+        uniforms = self.uniforms[games, self.used[games]]
+        self.used[games] += 1
+        return uniforms
+
+    # create a GameEngine which plays a game from this batch in exactly the same way, after run has been called
+    def scalar_engine(self, game, players):
+        deals = [deal_mask_tuples(block[game:game + 1])[0] for block in self.deals]
+        agents = [self.learned_agent if difficulty == 5 else None for difficulty in self.seats]
+        return GameEngine(players, agents, point_limit=self.point_limit, rng=UniformRandom(self.uniforms[game]), deals=iter(deals))
+
+    # agent which plays difficulty 5 in GameEngine with the simulator's model
+    def learned_agent(self, engine, seat):
+        from Learned import learned_choice
+        return learned_choice(engine, seat, self.model)
+
+# replay the first games of a batch with GameEngine and return the numbers of the games whose points differ
+def check_against_engine(sim, games):
+    mismatches = []
+    for game in range(min(games, sim.games)):
+        players = [Player(f'Bot {i+1}', True) for i in range(4)]
+        for player, difficulty in zip(players, sim.seats):
+            player.set_difficulty(int(difficulty))
+        sim.scalar_engine(game, players).play_game()
+        if [player.points for player in players] != sim.points[game].tolist():
+            mismatches.append(game)
+    return mismatches
+
+# read the command line options, run a batch and display the results
+def main():
+    parser = argparse.ArgumentParser(description='Play many games between difficulty 0-2 and 5 bots at once with numpy.')
+    parser.add_argument('--games', type=int, default=10000, help='number of games to play')
+    parser.add_argument('--seats', default='0,1,2,2', help='comma separated difficulties (0-2 or 5) of the 4 seats')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the deals and random choices')
+    parser.add_argument('--point-limit', type=int, default=POINT_LIMIT, help='points which end a game')
+    parser.add_argument('--check', type=int, default=0, help='replay this many games with GameEngine and check the results match')
+    args = parser.parse_args()
+
+    seats = [int(d) for d in args.seats.split(',')]
+    try:
+        sim = BatchSimulator(args.games, seats, args.seed, args.point_limit)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    sim.run()
+    elapsed = time.perf_counter() - start
+
+    wins = sim.winners()
+    print(f'\n{args.games} games, {sim.hands_played.sum()} hands in {elapsed:.2f}s ({args.games / elapsed:.0f} games/s)\n')
+    print(f"{'Seat':<8}{'Difficulty':>12}{'Wins':>10}{'Win %':>8}{'Avg points':>12}")
+    for seat in range(4):
+        print(f'{seat + 1:<8}{seats[seat]:>12}{wins[:, seat].sum():>10}{wins[:, seat].mean() * 100:>8.1f}{sim.points[:, seat].mean():>12.2f}')
+
+    if args.check:
+        mismatches = check_against_engine(sim, args.check)
+        print(f'\nChecked {min(args.check, args.games)} games against GameEngine: {len(mismatches)} differ')
+        if mismatches:
+            print('First differing games:', mismatches[:10])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+from Engine import GameEngine, bot_agent, create_deck, deal_deck, get_trick_winner, calculate_game_scores
+from Bot import make_choice, DecisionCache
+from Player import Player
+from Rules import legal_moves
+from MonteCarlo import get_position, run_samples, sample_hands
+from Endgame import ENDGAME_TRICKS, solve
+from State import GameState
+from Bitmask import indexes_from_mask
+from datetime import datetime
+import argparse
+import platform
+import random
+import json
+import sys
+import time
+
+# benchmarks for the hot paths, every call is timed on its own so latency percentiles can be reported
+# all inputs come from games played with fixed seeds so runs can be compared with each other
+
+# line-up used for the captured games and full hand/game benchmarks
+SEATS = [0, 1, 2, 3]
+
+# percentiles reported for each benchmark
+PERCENTILES = [50, 90, 99]
+
+# create 4 bots with the given difficulties
+def create_bots(seats):
+    players = [Player(f'Bot {i+1}', True) for i in range(len(seats))]
+    for player, difficulty in zip(players, seats):
+        player.set_difficulty(difficulty)
+    return players
+
+# agent which records the state of every decision before asking the bot AI
+class CaptureAgent():
+    # initialise the lists of captured states
+    def __init__(self):
+        self.decisions = []
+        self.positions = []
+
+    # record the decision and return the bot's choice
+    def __call__(self, engine, seat):
+        decision = (engine.players[seat].hand_mask, engine.round_num, engine.lead_suit, engine.heart_broken, engine.first_play, list(engine.current_trick))
+        self.decisions.append(decision)
+        self.positions.append((get_position(engine, seat), indexes_from_mask(legal_moves(decision[0], decision[1], decision[2], decision[4], decision[3] if decision[4] else True))))
+        return bot_agent(engine, seat)
+
+# play some seeded hands and capture every decision, trick and the trick piles at the end of each hand
+def capture_states(hands, seed):
+    capture = CaptureAgent()
+    players = create_bots(SEATS)
+    engine = GameEngine(players, agents=[capture] * 4, rng=random.Random(seed))
+    tricks = []
+    piles = []
+
+    for _ in range(hands):
+        engine.deal()
+        while players[0].hand_mask:
+            engine.play_trick()
+            tricks.append(list(engine.current_trick))
+        piles.append([player.trick_mask for player in players])
+        calculate_game_scores(players)
+
+    return capture, tricks, piles
+
+# time func once for each input, prepare is called before each call outside of the timing, returns nanoseconds per call
+def time_calls(func, inputs, prepare=None):
+    timer = time.perf_counter_ns
+    samples = []
+
+    for value in inputs:
+        if prepare is not None:
+            prepare(value)
+        start = timer()
+        func(value)
+        samples.append(timer() - start)
+
+    return samples
+
+# summarise a list of call times
+def summarise(samples):
+    samples = sorted(samples)
+    total = sum(samples)
+    result = {
+        'calls': len(samples),
+        'ops_per_sec': len(samples) / (total / 1e9) if total else 0.0,
+        'mean_us': total / len(samples) / 1000,
+    }
+    for p in PERCENTILES:
+        result[f'p{p}_us'] = samples[min(len(samples) - 1, len(samples) * p // 100)] / 1000
+    return result
+
+# build every benchmark as a name and a function returning its call times, scale multiplies the number of calls
+def get_benchmarks(seed, scale):
+    capture, tricks, piles = capture_states(max(1, 40 * scale), seed)
+    decisions = capture.decisions
+    benchmarks = {}
+
+    benchmarks['create_deck'] = lambda: time_calls(lambda _: create_deck(), range(2000 * scale))
+
+    # deal from a fresh deck each time, clearing the hands first
+    players = create_bots(SEATS)
+    rng = random.Random(seed)
+    def clear_hands(_):
+        for player in players:
+            player.clear_hand()
+    benchmarks['deal_deck'] = lambda: time_calls(lambda deck: deal_deck(players, deck, rng), [create_deck() for _ in range(1000 * scale)], clear_hands)
+
+    benchmarks['legal_moves'] = lambda: time_calls(lambda d: legal_moves(d[0], d[1], d[2], d[4], d[3] if d[4] else True), decisions)
+
+    # each difficulty decides every captured state with a bot holding the captured hand
+    bot = Player('Bot', True)
+    def make_decision(d):
+        make_choice(bot, d[1], d[2], d[3], d[4], d[5])
+    for difficulty in range(4):
+        def run(difficulty=difficulty):
+            bot.set_difficulty(difficulty)
+            return time_calls(make_decision, decisions, lambda d: bot.set_hand(d[0]))
+        benchmarks[f'make_choice_d{difficulty}'] = run
+
+    # difficulty 1-3 decisions through a decision cache already holding every captured state, so every call is a hit
+    cache = DecisionCache()
+    def cached_decision(d):
+        cache.choose(bot, d[1], d[2], d[3], d[4], d[5])
+    def set_bot(d):
+        bot.set_hand(d[0])
+        bot.set_difficulty(1 + d[1] % 3)
+    def run_cached():
+        time_calls(cached_decision, decisions, set_bot)
+        return time_calls(cached_decision, decisions, set_bot)
+    benchmarks['make_choice_cached'] = run_cached
+
+    # the monte carlo bot is much slower so only a sample of its positions are used, with a fixed number of iterations
+    def monte_carlo(item):
+        position, candidates = item
+        run_samples((position, candidates, 50, float('inf'), seed))
+    benchmarks['monte_carlo_d4'] = lambda: time_calls(monte_carlo, capture.positions[::max(1, len(capture.positions) // (20 * scale))])
+
+    # solve the last tricks exactly with the unseen cards dealt at random, every call gets a fresh transposition table
+    deal_rng = random.Random(seed)
+    endgames = [(sample_hands(position, deal_rng), position, candidates) for position, candidates in capture.positions if position[7] > 13 - ENDGAME_TRICKS]
+    def endgame(item):
+        hands, position, candidates = item
+        solve(hands, position[4], position[5], position[6], position[7], position[8], candidates, max_nodes=float('inf'), time_budget=float('inf'))
+    benchmarks['endgame_solve'] = lambda: time_calls(endgame, endgames[::max(1, len(endgames) // (200 * scale))])
+
+    # play out a whole hand on a GameState with the lowest legal card each turn then take it all back, and copy a state
+    deal_rng = random.Random(seed)
+    states = []
+    for _ in range(200 * scale):
+        cards = list(range(52))
+        deal_rng.shuffle(cards)
+        states.append(GameState([sum(1 << card for card in cards[seat::4]) for seat in range(4)]))
+    def play_undo(state):
+        while not state.hand_over():
+            moves = state.legal_moves()
+            state.apply((moves & -moves).bit_length() - 1)
+        while state.history:
+            state.undo()
+    benchmarks['state_apply_undo'] = lambda: time_calls(play_undo, states)
+    benchmarks['state_clone'] = lambda: time_calls(lambda state: state.clone(), states * 10)
+
+    benchmarks['trick_winner'] = lambda: time_calls(get_trick_winner, tricks * 4)
+
+    # score each captured set of trick piles, restoring the piles before each call
+    def set_piles(masks):
+        for player, mask in zip(players, masks):
+            player.set_trick_mask(mask)
+    benchmarks['calculate_game_scores'] = lambda: time_calls(lambda _: calculate_game_scores(players), piles * 10, set_piles)
+
+    # complete bot-only hands and games
+    def full_hand(engine):
+        engine.play_hand()
+    benchmarks['hand'] = lambda: time_calls(full_hand, [GameEngine(create_bots(SEATS), rng=random.Random(seed + i)) for i in range(100 * scale)])
+    benchmarks['game'] = lambda: time_calls(lambda engine: engine.play_game(), [GameEngine(create_bots(SEATS), rng=random.Random(seed + i)) for i in range(20 * scale)])
+
+    return benchmarks
+
+# run the benchmarks whose names contain any of the filters
+def run_benchmarks(seed=0, scale=1, only=None):
+    results = {}
+    for name, benchmark in get_benchmarks(seed, scale).items():
+        if only and not any(f in name for f in only):
+            continue
+        results[name] = summarise(benchmark())
+    return results
+
+# display the results as a table, with the change from a baseline if given
+def display_results(results, baseline=None):
+    print(f"\n{'Benchmark':<24}{'ops/s':>12}{'mean us':>10}" + ''.join(f"{f'p{p} us':>10}" for p in PERCENTILES) + (f"{'change':>9}" if baseline else ''))
+
+    for name, result in results.items():
+        line = f"{name:<24}{result['ops_per_sec']:>12.0f}{result['mean_us']:>10.2f}" + ''.join(f"{result[f'p{p}_us']:>10.2f}" for p in PERCENTILES)
+        if baseline and name in baseline:
+            line += f"{change(result, baseline[name]):>+8.1f}%"
+        print(line)
+    print('')
+
+# percentage change in ops/s from the baseline, negative is slower
+def change(result, base):
+    return (result['ops_per_sec'] / base['ops_per_sec'] - 1) * 100 if base['ops_per_sec'] else 0.0
+
+# list the benchmarks which have slowed down by more than threshold percent
+def find_regressions(results, baseline, threshold):
+    return [name for name, result in results.items() if name in baseline and change(result, baseline[name]) < -threshold]
+
+# read the command line options, run the benchmarks and save or compare the results
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dealing, move generation, bot decisions and full games.')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the captured games')
+    parser.add_argument('--scale', type=int, default=1, help='multiply the number of calls made by each benchmark')
+    parser.add_argument('--only', nargs='*', help='only run benchmarks whose names contain one of these')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file from a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percentage slowdown which counts as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.seed, args.scale, args.only)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    display_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {'time': datetime.now().isoformat(), 'python': platform.python_version(), 'platform': platform.platform(), 'seed': args.seed, 'scale': args.scale},
+                'results': results,
+            }, f, indent=2)
+
+    # exit with an error if anything got slower, so regressions can be caught automatically
+    if baseline:
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from Card import CARDS, SUIT_ORDER, SUIT_LETTERS
+
+# 52-bit integer representation of sets of cards (hands, trick piles, played cards)
+# each suit takes a block of 13 bits with the 2 in the lowest bit and the ace in the highest:
+# clubs are bits 0-12, diamonds 13-25, spades 26-38 and hearts 39-51
+# e.g. the 2 of clubs is bit 0 and the queen of spades is bit 26 + 10 = 36
+
+# offset of the lowest bit of each suit, looked up by suit name or suit letter
+SUIT_OFFSETS = {suit: i * 13 for i, suit in enumerate(SUIT_ORDER)}
+SUIT_OFFSETS.update({letter: i * 13 for i, letter in enumerate(SUIT_LETTERS)})
+
+# masks for whole suits and some important single cards
+SUIT_BITS = (1 << 13) - 1
+CLUBS_MASK = SUIT_BITS << SUIT_OFFSETS['clubs']
+DIAMONDS_MASK = SUIT_BITS << SUIT_OFFSETS['diamonds']
+SPADES_MASK = SUIT_BITS << SUIT_OFFSETS['spades']
+HEARTS_MASK = SUIT_BITS << SUIT_OFFSETS['hearts']
+FULL_MASK = (1 << 52) - 1
+TWO_CLUBS_BIT = 1 << SUIT_OFFSETS['clubs']
+QS_BIT = 1 << (SUIT_OFFSETS['spades'] + 10)
+
+# suit masks looked up by suit letter, as used for lead_suit
+SUIT_MASKS = {letter: SUIT_BITS << SUIT_OFFSETS[letter] for letter in SUIT_LETTERS}
+
+# look up the index of a card from its face e.g. 'QS' -> 36
+FACE_INDEX = {card.face: i for i, card in enumerate(CARDS)}
+
+# order used to display a hand, spades, hearts, diamonds then clubs with the highest value first
+DISPLAY_ORDER = sorted(range(52), reverse=True, key=lambda i: CARDS[i].sort_key)
+
+# the cards of every 13 bit pattern of one suit, highest first, each built from the pattern without its highest card
+def suit_display_table(offset):
+    table = [()]
+    for bits in range(1, 1 << 13):
+        high = bits.bit_length() - 1
+        table.append((CARDS[offset + high],) + table[bits ^ (1 << high)])
+    return table
+
+# display_cards looks up each suit's cards in one of these tables, in display order, rather than testing all 52 bits
+FIRST_OFFSET, SECOND_OFFSET, THIRD_OFFSET, FOURTH_OFFSET = [index // 13 * 13 for index in DISPLAY_ORDER[::13]]
+FIRST_DISPLAY, SECOND_DISPLAY, THIRD_DISPLAY, FOURTH_DISPLAY = [suit_display_table(offset) for offset in (FIRST_OFFSET, SECOND_OFFSET, THIRD_OFFSET, FOURTH_OFFSET)]
+
+# count the number of cards in a mask
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        return bin(mask).count('1')
+
+# get the bit index of a card
+def card_index(card):
+    return card.index
+
+# get the single bit mask of a card
+def card_bit(card):
+    return card.bit
+
+# get the single bit mask of a face string e.g. 'QS', returns 0 for unknown faces
+def face_bit(face):
+    index = FACE_INDEX.get(face)
+    return 0 if index is None else 1 << index
+
+# build a mask from a list of cards
+def mask_from_cards(cards):
+    mask = 0
+    for card in cards:
+        mask |= card.bit
+    return mask
+
+# list the bit indexes set in a mask, lowest first
+def indexes_from_mask(mask):
+    indexes = []
+    while mask:
+        low = mask & -mask
+        indexes.append(low.bit_length() - 1)
+        mask ^= low
+    return indexes
+
+# list the shared cards in a mask, lowest bit first
+def cards_from_mask(mask):
+    return [CARDS[i] for i in indexes_from_mask(mask)]
+
+# list the shared cards in a mask in the order a hand is displayed
+def display_cards(mask):
+    return list(FIRST_DISPLAY[mask >> FIRST_OFFSET & SUIT_BITS] + SECOND_DISPLAY[mask >> SECOND_OFFSET & SUIT_BITS]
+                + THIRD_DISPLAY[mask >> THIRD_OFFSET & SUIT_BITS] + FOURTH_DISPLAY[mask >> FOURTH_OFFSET & SUIT_BITS])
+
+# count the hearts in a mask
+def heart_count(mask):
+    return popcount(mask & HEARTS_MASK)
@@ -1,85 +1,61 @@
-from random import choice
-from Player import Player
-from Card import Card
-
-# some globals used in validation
-VALID_VALS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-VALID_SUITS = ['D', 'H', 'C', 'S']
+import random
+from collections import OrderedDict
+from threading import Lock
+from Card import card_from_face
+from Bitmask import CARDS, FACE_INDEX, SUIT_BITS, SUIT_MASKS, display_cards
+from Rules import STANDARD, PASS_COUNT
 
 # function to validate a card choice, returns True or False
-def is_valid_choice(chosen, player, round, lead_suit, first_play, heart_broken=True):
+def is_valid_choice(chosen, player, round, lead_suit, first_play, heart_broken=True, rules=STANDARD):
+    return rules.play_error(chosen, player.hand_mask, round, lead_suit, first_play, heart_broken) is None
 
-    # check if choice exists
-    if chosen == '':
-        return False
+# shared cards the bots look out for
+QUEEN_SPADES = card_from_face('QS')
+ACE_CLUBS = card_from_face('AC')
 
-    # choice should only be 2 or 3 characters characters
-    if len(chosen) < 2 or len(chosen) > 3:
-        return False
-    
-    # check if a valid value is entered (first character(s))
-    if not any(c == chosen[:-1] for c in VALID_VALS):
-        return False
-    
-    # check if a valid suit is entered (last character)
-    if not any(c == chosen[-1] for c in VALID_SUITS):
-        return False
-    
-    # check to see if chosen card is not in hand
-    if not any(card.face == chosen for card in player.hand):
-        return False
-    
-    # check for round 1 rules (no hearts or the queen of spades can be played)
-    if round == 1 and (chosen == 'QS' or chosen[-1] == 'H'):
-        return False
-    
-    # check to see if a card matching the lead suit is available
-    if any(card.face[-1] == lead_suit for card in player.hand) and chosen[-1] not in lead_suit:
-        return False
-    
-    # prevent playing a heart on first turn if heart_broken is specified as false
-    if chosen[-1] == 'H' and first_play and not heart_broken:
-        return False
-    
-    return True
+# spades the bots pass first, the queen and the cards likely to win it
+DANGER_SPADES = ('QS', 'KS', 'AS')
 
 # 0 difficulty is randomly generated
 # 1 difficulty will try and play the lowest cards to try and avoid taking tricks
 # 2 difficulty will try and play the highest card which is lower than the highest card in the trick, or highest card if no cards mathing the lead_suit is available
 # 3 difficulty is similar to 2, but will try to avoid playing queen of spades unless it knows it won't win the trick, will play ace of clubs on first round and will play hearts when its not leading suit
+# 4 difficulty samples possible deals and plays each card out to the end of the hand, it needs the whole game state so it is handled by Engine.bot_agent (see MonteCarlo.py)
+# 5 difficulty scores each legal card with a small model trained by self-play, it is also handled by Engine.bot_agent (see Learned.py)
 
 # make a decision based on bot difficulty and current game status
-def make_choice(bot, round, lead_suit, heart_broken, first_play, trick):
+# an optional random.Random can be given to make random choices reproducible, rules is the Rules.Variant being played
+def make_choice(bot, round, lead_suit, heart_broken, first_play, trick, rng=None, rules=STANDARD):
     
-    # first generate a list of valid plays
-    valid_cards = [card for card in bot.hand if is_valid_choice(card.face, bot, round, lead_suit, first_play, heart_broken if first_play else True)]
+    # first generate a list of valid plays, in the same order as the hand
+    valid_cards = display_cards(rules.legal_moves(bot.hand_mask, round, lead_suit, first_play, heart_broken if first_play else True))
 
     # remove queen of spades from valid_cards if difficulty is greater than 2 and other cards are available unless there is a higher card in trick
     if bot.difficulty >= 3:
 
         # decide on queen of spades
-        if any(card.face == 'QS' for card in valid_cards):
+        if any(card is QUEEN_SPADES for card in valid_cards):
             if len(valid_cards) != 1 and first_play:
-                valid_cards = [card for card in valid_cards if card.face != 'QS'] # remove queen of spades from valid cards if it doesn't have to play it on first turn
+                valid_cards = [card for card in valid_cards if card is not QUEEN_SPADES] # remove queen of spades from valid cards if it doesn't have to play it on first turn
             if len(valid_cards) == 1 or lead_suit != 'S':
                 return 'QS' # return queen of spades if its the only available card or spades isn't the lead suit
             else:
                 if any(card.value > 12 and card.suit == 'spades' and lead_suit == 'S' for card in trick):
                     return 'QS' # return queen of spades if there is a more valuable card in the trick
                 else:
-                    valid_cards = [card for card in valid_cards if card.face != 'QS']
+                    valid_cards = [card for card in valid_cards if card is not QUEEN_SPADES]
         
         # choose only hearts if valid and leading suit is not hearts
         if any(card.suit == 'hearts' for card in valid_cards) and lead_suit != 'H':
             valid_cards = [card for card in valid_cards if card.suit == 'hearts']
         
         # choose ace of clubs if available on first round
-        if any(card.face == 'AC' for card in valid_cards):
+        if any(card is ACE_CLUBS for card in valid_cards):
             return 'AC'
 
     # handle 0 difficulty
     if bot.difficulty == 0:
-        return choice(valid_cards).face
+        return (rng or random).choice(valid_cards).face
     
     # handle 1 difficulty
     elif bot.difficulty == 1:
@@ -110,4 +86,106 @@ def make_choice(bot, round, lead_suit, heart_broken, first_play, trick):
                 if optimal_cards != []:
                     return optimal_cards[-1]
                 else:
-                    return valid_cards[0].face
\ No newline at end of file
+                    return valid_cards[0].face
+
+# choose the faces of the cards a bot passes before the hand
+# difficulty 0 passes at random, the others keep any card worth negative points and pass the queen, king and ace of spades
+# first, then the highest cards, hearts before other suits of the same value
+def choose_pass(bot, rules=STANDARD, rng=None):
+    cards = list(bot.hand)
+    if bot.difficulty == 0:
+        return [card.face for card in (rng or random).sample(cards, PASS_COUNT)]
+
+    cards.sort(key=lambda card: (rules.card_points[card.index] < 0, card.face not in DANGER_SPADES, -card.value, card.suit != 'hearts'))
+    return [card.face for card in cards[:PASS_COUNT]]
+
+# number of decisions a DecisionCache keeps by default
+DECISION_CACHE_SIZE = 100000
+
+# policies difficulties 1 and 2 share, so a decision made for one bot can be reused by the other
+LOWEST, HIGHEST, BELOW = range(3)
+
+# bounded least recently used cache of bot decisions for difficulties 1-3, which always choose the same card in the same state
+# one cache can be shared by any number of games, including games played on other threads
+# difficulty 0 is random so it is never cached, and difficulty 4 doesn't use make_choice
+class DecisionCache():
+    # initialise an empty cache holding at most max_size decisions
+    def __init__(self, max_size=DECISION_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # make a decision with the same arguments and result as make_choice, using a stored decision if there is one
+    # decisions only depend on the legal cards, which are part of the key, so games with different rules can share a cache
+    def choose(self, bot, round, lead_suit, heart_broken, first_play, trick, rng=None, rules=STANDARD):
+        if not 1 <= bot.difficulty <= 3:
+            return make_choice(bot, round, lead_suit, heart_broken, first_play, trick, rng, rules)
+
+        key, suit = decision_key(bot, round, lead_suit, heart_broken, first_play, trick, rules)
+        with self.lock:
+            stored = self.entries.get(key)
+            if stored is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+
+        if stored is not None:
+            return stored if suit is None else CARDS[suit * 13 + stored].face
+
+        chosen = make_choice(bot, round, lead_suit, heart_broken, first_play, trick, rules=rules)
+        stored = chosen if suit is None else FACE_INDEX[chosen] - suit * 13
+        with self.lock:
+            self.entries[key] = stored
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return chosen
+
+    # fraction of decisions found in the cache
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # remove every decision and reset the counts
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+# build the cache key of a decision from the legal moves and the little of the trick that matters, returns the key and a suit number
+# difficulties 1 and 2 only look at card values when every legal card is the same suit (e.g. when following suit), so those keys hold
+# the cards as a 13-bit mask of values and the same decision is used for every suit, suit is then the suit to turn it back into a card
+# otherwise suit is None and the key holds the whole legal mask
+def decision_key(bot, round, lead_suit, heart_broken, first_play, trick, rules=STANDARD):
+    moves = rules.legal_moves(bot.hand_mask, round, lead_suit, first_play, heart_broken if first_play else True)
+
+    # difficulty 3 looks at the queen of spades, hearts and the ace of clubs so suits can't be swapped
+    if bot.difficulty >= 3:
+        return (bot.difficulty, moves, first_play, lead_suit, trick_high(trick, lead_suit)), None
+
+    # the same choices as make_choice, which card wins the trick is only needed when playing under it
+    if bot.difficulty == 1 or first_play:
+        key = (LOWEST, 0)
+    elif not moves & SUIT_MASKS.get(lead_suit, 0):
+        key = (HIGHEST, 0)
+    else:
+        key = (BELOW, trick_high(trick, lead_suit))
+
+    suit = ((moves & -moves).bit_length() - 1) // 13
+    if moves >> suit * 13 <= SUIT_BITS:
+        return key + (moves >> suit * 13,), suit
+    return key + (moves,), None
+
+# value of the highest card of the lead suit in the trick, 0 if there is none
+def trick_high(trick, lead_suit):
+    high = 0
+    for card in trick:
+        if card.value > high and card.face[-1] == lead_suit:
+            high = card.value
+    return high
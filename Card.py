@@ -1,10 +1,51 @@
+VALID_VALS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+VAL_CONVERSION = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'Jack', 'Queen', 'King', 'Ace']
+
+# suits in the order of the card indexes, clubs are 0-12, diamonds 13-25, spades 26-38 and hearts 39-51 (see Bitmask.py)
+SUIT_ORDER = ['clubs', 'diamonds', 'spades', 'hearts']
+SUIT_LETTERS = ['C', 'D', 'S', 'H']
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUIT_ORDER)}
+
 # create a card object to hold value and suit
+# there are only ever 52 cards, Card(value, suit) returns the shared card rather than creating a new one so cards can be compared with 'is'
+# cards can't be changed once created
 class Card():
-    # initialise the value and suit variables
     # face variable is used to display the card to the user e.g. 4H = 4 of hearts
     # a queen of spades will have value of 12 and face of QS
     # an ace of diamonds will have a value of 14 and face of AD
-    def __init__(self, value, suit, face):
-        self.value = value
-        self.suit = suit
-        self.face = face
\ No newline at end of file
+    # index is the card's position in the deck (0-51) and bit is 1 << index, name is the long name e.g. Queen of spades
+    __slots__ = ('value', 'suit', 'face', 'index', 'bit', 'name', 'sort_key')
+
+    # return the shared card, face is accepted so older calls still work but it is worked out from the value and suit
+    def __new__(cls, value, suit, face=None):
+        return CARDS[SUIT_INDEX[suit] * 13 + value - 2]
+
+    # prevent a shared card being changed
+    def __setattr__(self, name, value):
+        raise AttributeError('cards cannot be changed')
+
+    # copies and pickles of a card are the shared card
+    def __reduce__(self):
+        return (Card, (self.value, self.suit))
+
+    def __repr__(self):
+        return f'Card({self.face})'
+
+# create one of the 52 shared cards, only used to build CARDS
+def _create_card(index):
+    card = object.__new__(Card)
+    value, suit = index % 13 + 2, SUIT_ORDER[index // 13]
+    for name, attribute in (('value', value), ('suit', suit), ('face', f'{VALID_VALS[value-2]}{SUIT_LETTERS[index // 13]}'),
+                            ('index', index), ('bit', 1 << index), ('name', f'{VAL_CONVERSION[value-2]} of {suit}'), ('sort_key', (suit, value))):
+        object.__setattr__(card, name, attribute)
+    return card
+
+# every card in index order
+CARDS = [_create_card(index) for index in range(52)]
+
+# look up a card from its face e.g. 'QS'
+FACES = {card.face: card for card in CARDS}
+
+# get the card with the given face, or None if the face isn't valid
+def card_from_face(face):
+    return FACES.get(face)
@@ -0,0 +1,115 @@
+from Server import DEFAULT_PORT
+import argparse
+import asyncio
+import time
+
+# terminal client for Server.py, see the top of Server.py for the protocol
+# with --auto the client plays the first legal card itself, many of these can be run at once to load test a server
+
+# send a line to the server
+def send(writer, line):
+    writer.write(f'{line}\n'.encode())
+
+# ask for a card in a thread so the connection keeps being read while waiting
+async def ask_card(legal):
+    while True:
+        face = (await asyncio.get_running_loop().run_in_executor(None, input, f"Choose a card ({', '.join(legal)}): ")).strip().upper()
+        if face in legal:
+            return face
+        print('That card cannot be played.')
+
+# connect, join a table and play until the game is over, returns the winning seats
+async def play(host, port, table, name, difficulty=None, auto=False):
+    reader, writer = await asyncio.open_connection(host, port)
+    send(writer, f'JOIN {table} {name}')
+    names = []
+    seat = None
+    winners = []
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            words = line.decode().split()
+            if not words:
+                continue
+            message, args = words[0], words[1:]
+
+            if message == 'SEATED':
+                seat = int(args[1])
+                if not auto:
+                    print(f'Seated at table {args[0]} in seat {seat + 1}')
+                if difficulty is not None:
+                    send(writer, f'START {difficulty}')
+
+            elif message == 'TURN':
+                legal = args[3:]
+                if auto:
+                    face = legal[0]
+                else:
+                    face = await ask_card(legal)
+                send(writer, f'PLAY {face}')
+
+            elif message == 'GAMEOVER':
+                winners = [int(s) for s in args]
+                if not auto:
+                    print(f"\nWinner{'s' if len(winners) > 1 else ''}: {', '.join(names[s] for s in winners)}")
+                break
+
+            elif message == 'STARTED':
+                names = args
+
+            elif auto:
+                continue
+
+            elif message == 'HAND':
+                print(f"\nYour hand: {' '.join(args)}")
+            elif message == 'PLAYED':
+                print(f'{names[int(args[0])]} played {args[1]}')
+            elif message == 'TRICK':
+                print(f'{names[int(args[0])]} won the trick\n')
+            elif message == 'SCORES':
+                print('Scores: ' + ', '.join(f'{n} {p}' for n, p in zip(names, args)))
+            elif message in ('JOINED', 'ERROR'):
+                print(' '.join(words))
+
+            await writer.drain()
+
+    finally:
+        send(writer, 'QUIT')
+        writer.close()
+
+    return winners
+
+# play many automatic clients at once, each at its own table with bots, and report how long it took
+async def load_test(host, port, clients, difficulty):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play(host, port, f'load{i}', f'Client{i}', difficulty, True) for i in range(clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if isinstance(r, BaseException)]
+    print(f'{clients - len(failed)} of {clients} games finished in {elapsed:.2f}s ({(clients - len(failed)) / elapsed:.1f} games/s)')
+    for error in failed[:5]:
+        print(f'  {error!r}')
+
+# read the command line options and connect
+def main():
+    parser = argparse.ArgumentParser(description='Play hearts on a server started with Server.py.')
+    parser.add_argument('--host', default='127.0.0.1', help='address of the server')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port of the server')
+    parser.add_argument('--table', default='1', help='table to join')
+    parser.add_argument('--name', default='Player', help='name shown to the table')
+    parser.add_argument('--start', type=int, choices=range(6), help='start the game straight away with bots of this difficulty in the empty seats')
+    parser.add_argument('--auto', action='store_true', help='play the first legal card automatically')
+    parser.add_argument('--clients', type=int, help='load test, play this many automatic clients at their own tables')
+    args = parser.parse_args()
+
+    if args.clients:
+        asyncio.run(load_test(args.host, args.port, args.clients, 2 if args.start is None else args.start))
+    else:
+        asyncio.run(play(args.host, args.port, args.table, args.name.replace(' ', '_'), args.start, args.auto))
+
+
+if __name__ == "__main__":
+    main()
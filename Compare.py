@@ -0,0 +1,228 @@
+from Engine import GameEngine
+from Rules import POINT_LIMIT
+from MonteCarlo import MonteCarloAgent
+from Player import Player
+from Tournament import HandStats, game_seed
+from multiprocessing import Pool
+import argparse
+import math
+import os
+import random
+import time
+
+# compare two bot configurations with a sequential probability ratio test (SPRT), playing games until the result is clear
+# each configuration sits in two opposite seats, and every set of deals is played twice with the seats swapped (mirrored) so
+# both configurations get the same cards. the score of a game is the share of its winners from configuration A, and each
+# pair of mirrored games is one sample for the test, which stops as soon as A is shown to be elo1 stronger than B or not elo0 stronger
+#
+# a configuration is a difficulty, difficulty 4 can be given a number of iterations per move as 4:ITERATIONS (e.g. 4:200)
+# and difficulty 5 a weight file as 5:PATH (e.g. 5:weights/new.npz)
+
+# number of mirrored pairs each worker plays before sending results back
+PAIRS_PER_JOB = 4
+
+# the test can't stop before this many pairs, and the variance of the pair scores is never taken as less than VARIANCE_FLOOR
+# deterministic bots which are the same (or play the same cards) score exactly 0.5 every pair, which would never give a result
+MIN_PAIRS = 20
+VARIANCE_FLOOR = 0.001
+
+# convert an Elo difference to an expected score, and back
+def elo_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def score_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+# sequential probability ratio test on the mean of samples between 0 and 1, using the normal approximation of the log likelihood ratio
+# H0 is that A is elo0 stronger than B, H1 that it is elo1 stronger, alpha and beta are the chances of wrongly accepting H1 and H0
+class SPRT():
+    # initialise the bounds with no samples
+    def __init__(self, elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05):
+        self.score0 = elo_score(elo0)
+        self.score1 = elo_score(elo1)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    # add a sample
+    def add(self, score):
+        self.count += 1
+        self.total += score
+        self.squares += score * score
+
+    # mean and variance of the samples
+    def stats(self):
+        mean = self.total / self.count
+        return mean, max(self.squares / self.count - mean * mean, 0.0)
+
+    # log likelihood ratio of H1 against H0, 0 until there are enough samples
+    def llr(self):
+        if self.count < MIN_PAIRS:
+            return 0.0
+        mean, variance = self.stats()
+        variance = max(variance, VARIANCE_FLOOR)
+        return self.count * (self.score1 - self.score0) * (2 * mean - self.score0 - self.score1) / (2 * variance)
+
+    # 'H1' or 'H0' once one is accepted, otherwise None
+    def result(self):
+        llr = self.llr()
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+    # estimated Elo difference and the Elo of the ends of its 95% confidence interval
+    def elo(self):
+        mean, variance = self.stats()
+        margin = 1.96 * math.sqrt(variance / self.count)
+        return score_elo(mean), score_elo(mean - margin), score_elo(mean + margin)
+
+# read a configuration string into a difficulty and an optional setting, the iterations of difficulty 4 or weight file of difficulty 5
+def parse_config(text):
+    difficulty, _, setting = text.partition(':')
+    difficulty = int(difficulty)
+    if difficulty not in range(6) or (setting and difficulty not in (4, 5)):
+        raise ValueError(f'bad bot configuration {text!r}, use a difficulty 0-5, 4:ITERATIONS or 5:PATH')
+    if setting and difficulty == 4:
+        return difficulty, int(setting)
+    return difficulty, setting or None
+
+# agents already made in this process by configuration, so a weight file is loaded once per worker rather than once per game
+AGENTS = {}
+
+# get the agent for a configuration, None for the default bot
+def create_agent(difficulty, setting):
+    if setting is None:
+        return None
+    agent = AGENTS.get((difficulty, setting))
+    if agent is not None:
+        return agent
+
+    if difficulty == 4:
+        agent = MonteCarloAgent(setting)
+    else:
+        # numpy is only needed for the learned bot
+        from Learned import LearnedModel, learned_choice
+        model = LearnedModel.load(setting)
+        agent = lambda engine, seat: learned_choice(engine, seat, model)
+
+    AGENTS[difficulty, setting] = agent
+    return agent
+
+# play one game with a configuration in each seat, returns the players, the winners and the number of hands played
+def play_game(lineup, deals, seed, point_limit):
+    players = []
+    agents = []
+    for i, (difficulty, setting) in enumerate(lineup):
+        player = Player(f'Bot {i+1}', True)
+        player.set_difficulty(difficulty)
+        players.append(player)
+        agents.append(create_agent(difficulty, setting))
+
+    stats = HandStats()
+    winners = GameEngine(players, agents=agents, listeners=[stats], point_limit=point_limit, rng=random.Random(seed), deals=deals).play_game()
+    return players, winners, stats.hands
+
+# play a range of mirrored pairs, this is run in the worker processes
+# returns for each pair the score of A, and the points and hands A and B played over both games
+def play_pairs(job):
+    a, b, seed, start, stop, point_limit = job
+    from Deals import deal_stream
+    results = []
+
+    for index in range(start, stop):
+        score = 0.0
+        points = [0, 0]
+        hands = 0
+        for lineup, a_seats in (((a, b, a, b), (0, 2)), ((b, a, b, a), (1, 3))):
+            players, winners, game_hands = play_game(lineup, deal_stream(game_seed(seed, index)), game_seed(seed, index), point_limit)
+            score += sum(players.index(winner) in a_seats for winner in winners) / len(winners) / 2
+            for seat, player in enumerate(players):
+                points[seat not in a_seats] += player.points
+            hands += game_hands
+        results.append((score, points[0], points[1], hands))
+
+    return results
+
+# play mirrored pairs across a pool of workers until the test gives a result or max_pairs have been played
+# results are used in the order the pairs were dealt, so the outcome doesn't depend on the number of processes
+# progress is called after every pair with the test and the totals
+def run_comparison(a, b, sprt, seed=0, max_pairs=50000, processes=None, point_limit=POINT_LIMIT, progress=None):
+    totals = {'pairs': 0, 'hands': 0, 'a_points': 0, 'b_points': 0}
+    jobs = ((a, b, seed, start, min(start + PAIRS_PER_JOB, max_pairs), point_limit) for start in range(0, max_pairs, PAIRS_PER_JOB))
+
+    with Pool(processes) as pool:
+        for results in pool.imap(play_pairs, jobs):
+            for score, a_points, b_points, hands in results:
+                sprt.add(score)
+                totals['pairs'] += 1
+                totals['a_points'] += a_points
+                totals['b_points'] += b_points
+                totals['hands'] += hands
+                if progress is not None:
+                    progress(sprt, totals)
+                if sprt.result() is not None:
+                    return sprt.result(), totals
+
+    return None, totals
+
+# show the test's progress on one line
+def show_progress(sprt, totals):
+    if totals['pairs'] % 10 == 0:
+        print(f"\r{totals['pairs'] * 2} games, LLR {sprt.llr():.2f} ({sprt.lower:.2f}, {sprt.upper:.2f})   ", end='', flush=True)
+
+# display the outcome of a comparison
+def display_result(a, b, sprt, result, totals, elapsed):
+    games = totals['pairs'] * 2
+    print(f'\n\nPlayed {games} games ({totals["pairs"]} mirrored pairs) in {elapsed:.2f}s')
+    if result == 'H1':
+        print(f'{a} is stronger than {b}: H1 accepted (LLR {sprt.llr():.2f})')
+    elif result == 'H0':
+        print(f'{a} is not stronger than {b}: H0 accepted (LLR {sprt.llr():.2f})')
+    else:
+        print(f'No result after the game limit (LLR {sprt.llr():.2f})')
+
+    if sprt.count:
+        elo, low, high = sprt.elo()
+        mean, _ = sprt.stats()
+        print(f'Score of {a}: {mean:.3f}, Elo difference {elo:+.1f} (95% {low:+.1f} to {high:+.1f})')
+
+    # each configuration has 2 seats in every hand
+    if totals['hands']:
+        seat_hands = 2 * totals['hands']
+        a_rate, b_rate = totals['a_points'] / seat_hands, totals['b_points'] / seat_hands
+        print(f'Points per hand: {a} {a_rate:.3f}, {b} {b_rate:.3f}, delta {a_rate - b_rate:+.3f}')
+    print('')
+
+# read the command line options and run a comparison
+def main():
+    parser = argparse.ArgumentParser(description='Play two bot configurations against each other until an SPRT decides which is stronger.')
+    parser.add_argument('a', help='configuration being tested, a difficulty 0-5, 4:ITERATIONS or 5:PATH')
+    parser.add_argument('b', help='configuration to compare it against')
+    parser.add_argument('--elo0', type=float, default=0.0, help='Elo difference of H0, A is no stronger than this')
+    parser.add_argument('--elo1', type=float, default=20.0, help='Elo difference of H1, A is at least this much stronger')
+    parser.add_argument('--alpha', type=float, default=0.05, help='chance of accepting H1 when H0 is true')
+    parser.add_argument('--beta', type=float, default=0.05, help='chance of accepting H0 when H1 is true')
+    parser.add_argument('--max-games', type=int, default=100000, help='stop without a result after this many games')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='seed used to make the deals reproducible')
+    parser.add_argument('--point-limit', type=int, default=POINT_LIMIT, help='points which end a game')
+    args = parser.parse_args()
+
+    try:
+        a, b = parse_config(args.a), parse_config(args.b)
+    except ValueError as error:
+        parser.error(str(error))
+
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+    start = time.perf_counter()
+    result, totals = run_comparison(a, b, sprt, args.seed, args.max_games // 2, args.processes, args.point_limit, show_progress)
+    display_result(args.a, args.b, sprt, result, totals, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
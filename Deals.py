@@ -0,0 +1,53 @@
+import numpy as np
+
+# batch deal generator using numpy, every deal is a (4, 13) array of card indexes (see Bitmask.py) with one row per seat
+# nothing is printed, and the same seed always gives the same deals
+
+# card indexes which can't make up a whole hand, hearts are 39-51 and the queen of spades is 36
+HEARTS_START = 39
+QS_INDEX = 36
+
+# check a batch of deals, returns True for each deal where every hand has at least one card that isn't a heart or the queen of spades
+def valid_deals(deals):
+    return ((deals < HEARTS_START) & (deals != QS_INDEX)).any(axis=2).all(axis=1)
+
+# generate count valid deals as a (count, 4, 13) array
+# a seed or numpy Generator can be given, canonical sorts each hand by card index
+def generate_deals(count, seed=None, rng=None, canonical=False):
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    deals = np.empty((0, 4, 13), dtype=np.uint8)
+
+    # keep shuffling batches until there are enough valid deals, very few are ever rejected
+    while len(deals) < count:
+        needed = count - len(deals)
+        batch = rng.permuted(np.tile(np.arange(52, dtype=np.uint8), (needed, 1)), axis=1).reshape(needed, 4, 13)
+        deals = np.concatenate((deals, batch[valid_deals(batch)]))
+
+    if canonical:
+        deals.sort(axis=2)
+
+    return deals
+
+# convert a batch of deals into a (count, 4) array of 52-bit hand masks
+def deal_masks(deals):
+    return np.bitwise_or.reduce(np.left_shift(np.uint64(1), deals.astype(np.uint64)), axis=2)
+
+# convert a batch of deals into a list of hand mask tuples, as used by GameEngine(deals=...)
+def deal_mask_tuples(deals):
+    return [tuple(int(mask) for mask in row) for row in deal_masks(deals)]
+
+# rotate a deal so the hand of seat i goes to seat i + shift
+def rotate_deal(hands, shift):
+    return tuple(hands[(seat - shift) % 4] for seat in range(len(hands)))
+
+# endless stream of hand mask tuples from a seed, generated in batches
+def deal_stream(seed, batch_size=16):
+    rng = np.random.default_rng(seed)
+    while True:
+        yield from deal_mask_tuples(generate_deals(batch_size, rng=rng))
+
+# duplicate mode, yields every deal once for each of the 4 seat rotations so every seat plays every hand
+def duplicate_deals(deals):
+    for hands in deals:
+        for shift in range(4):
+            yield rotate_deal(hands, shift)
@@ -0,0 +1,335 @@
+from Bitmask import SUIT_LETTERS, QS_BIT, heart_count, indexes_from_mask, popcount
+from Rules import STANDARD, legal_moves
+import random
+import time
+
+# exact solver for the last few tricks of a hand when every hand is known (or sampled, as in MonteCarlo.py)
+# the seat being solved for tries to take as few points as possible and the other 3 seats are assumed to work together
+# to give it as many as possible, which makes the search a two player alpha-beta search over the normal rules in Rules.py
+#
+# positions are hashed with Zobrist keys (a random number for each card in each hand, card in the trick, leader etc. xored together)
+# so a position reached by playing the same cards in a different order is only searched once
+
+# number of tricks left at which the bots start solving exactly, 4 tricks usually takes a few milliseconds
+ENDGAME_TRICKS = 4
+
+# default budget for a single solve, it gives up at whichever limit is reached first
+# a node is one card played in the search, about 8 microseconds each
+MAX_NODES = 20000
+TIME_BUDGET = 0.1
+
+# default number of positions kept in a transposition table
+TABLE_SIZE = 100000
+
+# how often (in nodes) the time budget is checked
+CHECK_INTERVAL = 1024
+
+# random keys for each part of a position, seeded so keys are the same in every process
+_keys = random.Random(0x4845415254)
+HAND_KEYS = [[_keys.getrandbits(64) for _ in range(52)] for _ in range(4)]
+LEADER_KEYS = [_keys.getrandbits(64) for _ in range(4)]
+ROOT_KEYS = [_keys.getrandbits(64) for _ in range(4)]
+POINTS_KEYS = [_keys.getrandbits(64) for _ in range(27)]
+SCORED_KEYS = [_keys.getrandbits(64) for _ in range(16)]
+HEARTS_BROKEN_KEY = _keys.getrandbits(64)
+MOONLESS_KEY = _keys.getrandbits(64)
+
+# raised inside the search when the node or time budget runs out
+class BudgetExceeded(Exception):
+    pass
+
+# bounded table of solved positions, the oldest entries are removed first once it is full
+# each entry is (lower bound, upper bound, best card) of the points the solved seat ends the hand with
+class TranspositionTable():
+    # initialise an empty table holding at most max_size positions
+    def __init__(self, max_size=TABLE_SIZE):
+        self.max_size = max_size
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    # look up a position, returns None if it isn't stored
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    # store a position, removing the oldest one if the table is full
+    def store(self, key, lower, upper, move):
+        entries = self.entries
+        if key not in entries and len(entries) >= self.max_size:
+            del entries[next(iter(entries))]
+        entries[key] = (lower, upper, move)
+
+    def __len__(self):
+        return len(self.entries)
+
+    # remove every position
+    def clear(self):
+        self.entries.clear()
+
+# build the Zobrist key of the cards held, the leader and if hearts are broken
+# the cards in the current trick aren't included as positions are only stored between tricks, and the points taken are added when storing
+def position_key(hands, leader, heart_broken, root):
+    key = LEADER_KEYS[leader] ^ ROOT_KEYS[root]
+    if heart_broken:
+        key ^= HEARTS_BROKEN_KEY
+    for seat in range(4):
+        for index in indexes_from_mask(hands[seat]):
+            key ^= HAND_KEYS[seat][index]
+    return key
+
+# 4 bit mask of the seats which have taken points, used to tell if someone can still shoot the moon
+def scored_seats(points):
+    return (points[0] > 0) | (points[1] > 0) << 1 | (points[2] > 0) << 2 | (points[3] > 0) << 3
+
+# points the root seat ends the hand with, if someone shot the moon everyone else gets 26 points
+def final_points(points, root):
+    if 26 in points:
+        return 0 if points[root] == 26 else 26
+    return points[root]
+
+# sort keys for move ordering, the lowest rank first when leading and when a suit can't be followed
+# the queen of spades, then the highest hearts, then the highest other cards
+LEAD_ORDER = [index % 13 for index in range(52)]
+DISCARD_ORDER = [0 if index == 36 else (13 - index % 13 if index >= 39 else 26 - index % 13) for index in range(52)]
+
+# list the moves worth searching, in the order most likely to be best so cutoffs happen sooner
+# two cards of a suit give the same result if no card between them is still in play and they are worth the same points, so only one is kept
+# leading plays the lowest card first, following plays the highest card which doesn't win the trick first
+# and when a suit can't be followed the queen of spades, then hearts, then high cards are thrown away first
+def ordered_moves(moves, live, trick):
+    kept = []
+    previous = -1
+    while moves:
+        low = moves & -moves
+        index = low.bit_length() - 1
+        moves ^= low
+        if previous < 0 or index // 13 != previous // 13 or (live >> (previous + 1)) & ((1 << (index - previous - 1)) - 1) or index == 36 or previous == 36:
+            kept.append(index)
+        previous = index
+
+    if not trick:
+        kept.sort(key=LEAD_ORDER.__getitem__)
+        return kept
+
+    lead = trick[0] // 13
+    if kept[0] // 13 != lead:
+        kept.sort(key=DISCARD_ORDER.__getitem__)
+        return kept
+
+    winning = max(index for index in trick if index // 13 == lead)
+    below = [index for index in kept if index < winning]
+    below.reverse()
+    return below + [index for index in kept if index > winning]
+
+# exact search of a position for one seat, the hands and points are changed while searching and put back after
+# positions are only stored in the table at the start of a trick, where the same position is most often reached again
+class Solver():
+    # initialise the search, points is the points each seat has taken this hand so far
+    def __init__(self, hands, points, root, table=None, max_nodes=MAX_NODES, time_budget=TIME_BUDGET):
+        self.hands = list(hands)
+        self.points = list(points)
+        self.root = root
+        self.table = table if table is not None else TranspositionTable()
+        self.max_nodes = max_nodes
+        self.deadline = time.perf_counter() + time_budget
+        self.nodes = 0
+
+    # search from the start of a trick and return the root seat's final points
+    # alpha and beta are the bounds the result matters within, a result outside them is only a bound
+    def search(self, leader, round_num, heart_broken, key, alpha, beta):
+        hands = self.hands
+        points = self.points
+        root = self.root
+
+        # nothing left to search if no points are left
+        left = hands[0] | hands[1] | hands[2] | hands[3]
+        remaining = heart_count(left) + (13 if left & QS_BIT else 0)
+        if not remaining:
+            return final_points(points, root)
+
+        # nobody can shoot the moon once two seats have taken points, so the root seat ends with its points plus what it takes from here
+        # the table then stores only what is taken from here, so the position is found again however the earlier points were shared
+        # and if the points left can't change the result there is nothing to search
+        scored = scored_seats(points)
+        if popcount(scored) > 1:
+            offset = points[root]
+            if offset >= beta:
+                return offset
+            if offset + remaining <= alpha:
+                return offset + remaining
+            table_key = key ^ MOONLESS_KEY
+            unknown = (0, remaining)
+        else:
+            offset = 0
+            table_key = key ^ POINTS_KEYS[points[root]] ^ SCORED_KEYS[scored]
+            unknown = (0, 26)
+
+        # every card is forced on the last trick
+        if round_num == 13:
+            trick = [(hands[(leader + i) % 4]).bit_length() - 1 for i in range(4)]
+            winner = trick_winner(trick, leader)
+            points[winner] += remaining
+            value = final_points(points, root)
+            points[winner] -= remaining
+            return value
+
+        # use what is already known about this position
+        entry = self.table.get(table_key)
+        best_move = None
+        if entry is not None:
+            lower, upper, best_move = entry
+            lower += offset
+            upper += offset
+            if lower >= beta or lower == upper:
+                return lower
+            if upper <= alpha:
+                return upper
+            alpha = max(alpha, lower)
+            beta = min(beta, upper)
+
+        value, best_move = self.play((), leader, round_num, heart_broken, key, alpha, beta, best_move)
+
+        # store the result as a bound if the search was cut off
+        self.table.store(table_key, value - offset if value > alpha else unknown[0], value - offset if value < beta else unknown[1], best_move)
+        return value
+
+    # search the rest of a trick with the cards in trick already played, returns the root seat's final points and the best card
+    # first is a card to try before the others, e.g. the best card found by an earlier search
+    def play(self, trick, leader, round_num, heart_broken, key, alpha, beta, first=None):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and (self.nodes >= self.max_nodes or time.perf_counter() > self.deadline):
+            raise BudgetExceeded()
+
+        hands = self.hands
+        seat = (leader + len(trick)) % 4
+        if trick:
+            moves = legal_moves(hands[seat], round_num, SUIT_LETTERS[trick[0] // 13], False)
+        else:
+            moves = legal_moves(hands[seat], round_num, 'DHCS', True, heart_broken)
+
+        live = hands[0] | hands[1] | hands[2] | hands[3]
+        for index in trick:
+            live |= 1 << index
+        moves = ordered_moves(moves, live, trick)
+        if first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+
+        # the root seat wants the fewest points, everyone else wants the root seat to have the most
+        minimising = seat == self.root
+        best = 27 if minimising else -1
+        best_move = None
+
+        for index in moves:
+            bit = 1 << index
+            hands[seat] ^= bit
+            child_key = key ^ HAND_KEYS[seat][index]
+            broken = heart_broken or index >= 39
+            if broken != heart_broken:
+                child_key ^= HEARTS_BROKEN_KEY
+
+            if len(trick) < 3:
+                value = self.play(trick + (index,), leader, round_num, broken, child_key, alpha, beta)[0]
+            else:
+                value = self.finish_trick(trick + (index,), leader, round_num, broken, child_key, alpha, beta)
+
+            hands[seat] ^= bit
+
+            if minimising:
+                if value < best:
+                    best, best_move = value, index
+                    beta = min(beta, value)
+            elif value > best:
+                best, best_move = value, index
+                alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        return best, best_move
+
+    # give a full trick to its winner and search on from the next trick
+    def finish_trick(self, trick, leader, round_num, heart_broken, key, alpha, beta):
+        winner = trick_winner(trick, leader)
+        mask = (1 << trick[0]) | (1 << trick[1]) | (1 << trick[2]) | (1 << trick[3])
+        gained = heart_count(mask) + (13 if mask & QS_BIT else 0)
+
+        key ^= LEADER_KEYS[leader] ^ LEADER_KEYS[winner]
+        if not gained:
+            return self.search(winner, round_num + 1, heart_broken, key, alpha, beta)
+
+        points = self.points
+        points[winner] += gained
+        value = self.search(winner, round_num + 1, heart_broken, key, alpha, beta)
+        points[winner] -= gained
+        return value
+
+# seat which wins a full trick of card indexes, the highest card of the lead suit wins
+def trick_winner(trick, leader):
+    lead = trick[0] // 13
+    best = 0
+    for i in range(1, 4):
+        if trick[i] // 13 == lead and trick[i] > trick[best]:
+            best = i
+    return (leader + best) % 4
+
+# the solver has the standard play and scoring built in, so it refuses a Rules.Variant which changes them
+def check_rules(rules):
+    if not rules.standard_play:
+        raise ValueError(f'the endgame solver only plays the standard rules, not {rules.describe()}')
+
+# list the legal cards for the seat to play next
+def candidate_moves(hands, trick, leader, round_num, heart_broken):
+    seat = (leader + len(trick)) % 4
+    if trick:
+        return indexes_from_mask(legal_moves(hands[seat], round_num, SUIT_LETTERS[trick[0] // 13], False))
+    return indexes_from_mask(legal_moves(hands[seat], round_num, 'DHCS', True, heart_broken))
+
+# solve a position exactly for the seat to play, returns the final points of that seat after each candidate card
+# hands are the 4 masks of the cards still held, taken the masks of the cards each seat has won, trick the card indexes in the current trick
+# returns None if the budget runs out, the table can be shared between calls so later solves reuse earlier work
+# rules is the Rules.Variant being played, only variants which play and score cards as the standard game can be solved
+def solve(hands, taken, trick, leader, round_num, heart_broken, candidates=None, table=None, max_nodes=MAX_NODES, time_budget=TIME_BUDGET, rules=STANDARD):
+    check_rules(rules)
+    trick = tuple(trick)
+    seat = (leader + len(trick)) % 4
+    points = [heart_count(mask) + (13 if mask & QS_BIT else 0) for mask in taken]
+    solver = Solver(hands, points, seat, table, max_nodes, time_budget)
+    if candidates is None:
+        candidates = candidate_moves(hands, trick, leader, round_num, heart_broken)
+
+    key = position_key(solver.hands, leader, heart_broken, seat)
+    values = []
+    try:
+        for index in candidates:
+            # play the candidate, then search the rest of the hand with a full window so every candidate gets an exact value
+            solver.hands[seat] ^= 1 << index
+            broken = heart_broken or index >= 39
+            child_key = key ^ HAND_KEYS[seat][index] ^ (HEARTS_BROKEN_KEY if broken != heart_broken else 0)
+            if len(trick) < 3:
+                values.append(solver.play(trick + (index,), leader, round_num, broken, child_key, -1, 27)[0])
+            else:
+                values.append(solver.finish_trick(trick + (index,), leader, round_num, broken, child_key, -1, 27))
+            solver.hands[seat] ^= 1 << index
+    except BudgetExceeded:
+        return None
+
+    return values
+
+# pick the best card for the seat to play when every hand is known, returns the card index or None if the budget runs out
+# only the best card is needed so the other cards are cut off as soon as they are shown to be no better
+def solve_choice(hands, taken, trick, leader, round_num, heart_broken, table=None, max_nodes=MAX_NODES, time_budget=TIME_BUDGET, rules=STANDARD):
+    check_rules(rules)
+    trick = tuple(trick)
+    seat = (leader + len(trick)) % 4
+    points = [heart_count(mask) + (13 if mask & QS_BIT else 0) for mask in taken]
+    solver = Solver(hands, points, seat, table, max_nodes, time_budget)
+
+    try:
+        return solver.play(trick, leader, round_num, heart_broken, position_key(solver.hands, leader, heart_broken, seat), -1, 27)[1]
+    except BudgetExceeded:
+        return None
@@ -0,0 +1,382 @@
+import random
+from Bot import make_choice, choose_pass
+from MonteCarlo import monte_carlo_choice
+from Card import Card
+from Bitmask import HEARTS_MASK, QS_BIT, TWO_CLUBS_BIT, FACE_INDEX, mask_from_cards
+from Instrument import STATS
+from Tracker import CardTracker
+from Rules import STANDARD, legal_moves
+from time import perf_counter_ns
+
+# the shared cards in the order the deck is created, hearts, clubs, spades then diamonds
+DECK = [Card(i, suit) for suit in ['hearts', 'clubs', 'spades', 'diamonds'] for i in range(2, 15)]
+
+# function to create the deck, a new list of the shared cards
+def create_deck():
+    return list(DECK)
+
+# check a players hand to make sure they don't have all hearts and/or queen of spades in their hand
+def validate_hands(players):
+    hands_valid = True
+    # loop through players and check their hands
+    for player in players:
+        if not player.hand_mask & ~(HEARTS_MASK | QS_BIT):
+            hands_valid = False
+            break
+    # clear everyones hand for re-deal if any are invalid
+    if not hands_valid:
+        for player in players:
+            player.clear_hand()
+
+    return hands_valid
+
+# deal the deck between 4 players, an optional random.Random can be given for reproducible deals
+def deal_deck(players, deck, rng=None):
+    timed = STATS.enabled
+    if timed:
+        start = perf_counter_ns()
+
+    # include validation check, the first check always fails as the hands start empty
+    deals = 0
+    while not validate_hands(players):
+        deals += 1
+
+        # shuffle the deck
+        (rng or random).shuffle(deck)
+
+        # give each player the next 13 cards of the deck, as a single mask
+        players[0].set_hand(mask_from_cards(deck[:13]))
+        players[1].set_hand(mask_from_cards(deck[13:26]))
+        players[2].set_hand(mask_from_cards(deck[26:39]))
+        players[3].set_hand(mask_from_cards(deck[39:]))
+
+    if timed:
+        STATS.record('deal_deck', start)
+        STATS.count('redeals', n=deals - 1)
+
+# find the index of the player with 2 of clubs (this will be lead player on game 1)
+def find_2_clubs(players):
+    index = 0
+
+    # loop through players and return index once 2 of clubs is found
+    for player in players:
+
+        # check to see if any cards are the 2 of clubs
+        if player.hand_mask & TWO_CLUBS_BIT:
+            return index
+
+        # increment index
+        index += 1
+    # retun none if 2 of clubs not found
+    return None
+
+# generate a list of indexes in the turn order of players, starting with the lead player
+def get_turn_order(lead_index):
+    # modulus 4 on lead index and adds to list, then repeats, adding 1 to index each time
+    # a lead index of 2 for example:
+    # 2 % 4 = 2, 3 % 4 = 3, 4 % 4 = 0, 5 % 4 = 1 therefore...
+    # returned list = [2, 3, 0, 1]
+    return [i % 4 for i in range(lead_index, lead_index+4)]
+
+# find the position in the trick of the highest card matching the lead suit, as Rules.trick_winner but on the cards themselves
+def get_trick_winner(trick):
+    lead = trick[0].suit
+    best = 0
+    for i in range(1, len(trick)):
+        if trick[i].suit == lead and trick[i].index > trick[best].index:
+            best = i
+    return best
+
+# calculate scores at the end of each hand with the given rules, including anyone who 'shot the moon'
+def calculate_game_scores(players, rules=STANDARD):
+    for player, score in zip(players, rules.hand_scores([player.trick_mask for player in players])):
+        player.points += score
+
+    # reset trick hand of every player
+    for player in players:
+        player.reset_trick_hand()
+
+# find the player with the lowest points
+def get_winners(players):
+    # create a list of points for each player and find the minimum score
+    min_score = min([player.points for player in players])
+
+    # loop through players and return a list of all players with min_score
+    return [player for player in players if player.points == min_score]
+
+# reset everyone's trick counter between rounds
+def reset_trick_counters(players):
+    for player in players:
+        player.tricks_won = 0
+
+# default agent, asks the bot AI for a card using the current engine state
+# difficulties 4 and 5 need to see the whole game state so they are handled here rather than in make_choice
+def bot_agent(engine, seat):
+    player = engine.players[seat]
+    timed = STATS.enabled
+    if timed:
+        start = perf_counter_ns()
+
+    if player.difficulty == 4:
+        chosen = monte_carlo_choice(engine, seat)
+    elif player.difficulty == 5:
+        # numpy is only needed for the learned bot
+        from Learned import learned_choice
+        chosen = learned_choice(engine, seat)
+    elif engine.decision_cache is not None:
+        chosen = engine.decision_cache.choose(player, engine.round_num, engine.lead_suit, engine.heart_broken, engine.first_play, engine.current_trick, rng=engine.rng, rules=engine.rules)
+    else:
+        chosen = make_choice(player, engine.round_num, engine.lead_suit, engine.heart_broken, engine.first_play, engine.current_trick, rng=engine.rng, rules=engine.rules)
+
+    if timed:
+        STATS.record('make_choice', start, player)
+    return chosen
+
+# default passing agent, the bot AI picks the cards to pass
+def bot_pass(engine, seat):
+    return choose_pass(engine.players[seat], engine.rules, engine.rng)
+
+# base class for anything that wants to follow the game as it is played (display, logging etc)
+# every method does nothing by default so listeners only override what they need
+class GameListener():
+    # called once the cards have been passed, offset is the number of seats along each player passed to
+    # and passed holds the cards each seat gave away
+    def on_pass(self, engine, offset, passed):
+        pass
+
+    # called once the deck has been dealt (and any cards passed) and before the first trick
+    def on_deal(self, engine):
+        pass
+
+    # called before a player chooses their card
+    def on_turn(self, engine, seat):
+        pass
+
+    # called after a card has been added to the trick
+    def on_play(self, engine, seat, card):
+        pass
+
+    # called once a trick has been given to its winner
+    def on_trick(self, engine, seat):
+        pass
+
+    # called after the scores for a hand have been calculated
+    def on_hand_end(self, engine):
+        pass
+
+# headless game engine, plays hands and games without any input, output or delays
+# agents are callables taking (engine, seat) and returning the face of the card to play, None uses the bot AI
+# deals is an optional iterator of pre-made deals (a tuple of 4 hand masks each, see Deals.py) used instead of shuffling
+# decision_cache is an optional Bot.DecisionCache for the bots' decisions, one cache can be shared by many engines
+# rules is the Rules.Variant played, point_limit overrides its point limit
+# pass_agents are callables taking (engine, seat) and returning the faces of the cards to pass, None uses the bot AI
+class GameEngine():
+    # initialise the players, their agents and the game state
+    def __init__(self, players, agents=None, listeners=None, point_limit=None, rng=None, deals=None, decision_cache=None, rules=None, pass_agents=None):
+        self.players = players
+        self.deals = deals
+        self.decision_cache = decision_cache
+        self.agents = [agent or bot_agent for agent in (agents or [None] * len(players))]
+        self.pass_agents = [agent or bot_pass for agent in (pass_agents or [None] * len(players))]
+        self.listeners = listeners or []
+        self.rules = rules or STANDARD
+        for player in players:
+            player.rules = self.rules
+        self.point_limit = self.rules.point_limit if point_limit is None else point_limit
+        self.rng = rng
+
+        # number of hands dealt so far, which decides the passing direction
+        self.hands_dealt = 0
+
+        # state of the hand currently being played
+        self.heart_broken = False
+        self.round_num = 1
+        self.lead_index = 0
+        self.lead_suit = 'DHCS'
+        self.first_play = True
+        self.current_trick = []
+        self.trick_players = []
+
+        # what has been seen of the hand so far (cards played, suits players have shown out of), shared by the bots
+        self.tracker = CardTracker()
+
+    # create a shuffled deck and deal until everyone's hands are valid
+    def deal(self):
+        if self.deals is None:
+            deal_deck(self.players, create_deck(), self.rng)
+        else:
+            for player, hand in zip(self.players, next(self.deals)):
+                player.set_hand(hand)
+
+        offset = self.rules.pass_offset(self.hands_dealt)
+        if offset:
+            self.pass_cards(offset)
+        self.hands_dealt += 1
+
+        # set/reset heart_broken variable, round_num and players tricks won count
+        self.heart_broken = False
+        self.round_num = 1
+        self.tracker.reset()
+        self.lead_index = find_2_clubs(self.players)
+        reset_trick_counters(self.players)
+
+        for listener in self.listeners:
+            listener.on_deal(self)
+
+    # ask every seat for the cards to pass, then give each seat's cards to the player offset seats along
+    def pass_cards(self, offset):
+        passed = []
+        for seat, player in enumerate(self.players):
+            passed.append([player.remove_card_from_hand(face) for face in self.pass_agents[seat](self, seat)])
+
+        for seat, cards in enumerate(passed):
+            receiver = self.players[(seat + offset) % 4]
+            for card in cards:
+                receiver.add_card_to_hand(card)
+
+        for listener in self.listeners:
+            listener.on_pass(self, offset, passed)
+
+    # check if the next card is played automatically (the 2 of clubs leading round 1) rather than chosen
+    def is_automatic_play(self):
+        return self.round_num == 1 and self.first_play
+
+    # let the player in the given seat choose a card and add it to the trick
+    # a card already chosen elsewhere (e.g. by a player over the network) can be given instead of asking the agent
+    def play_turn(self, seat, chosen=None):
+        player = self.players[seat]
+        timed = STATS.enabled
+        if timed:
+            start = perf_counter_ns()
+
+        for listener in self.listeners:
+            listener.on_turn(self, seat)
+
+        # automatically play 2 of clubs for the lead player on round 1, otherwise ask the agent
+        first_play = self.first_play
+        if first_play and self.round_num == 1:
+            chosen = '2C'
+        elif chosen is None:
+            chosen = self.agents[seat](self, seat)
+            if timed:
+                STATS.count('decisions', player)
+
+        # agents and cards sent over the network aren't trusted, a card which can't be played is refused with the reason
+        rules = self.rules
+        index = FACE_INDEX.get(chosen)
+        if index is None or not legal_moves(player.hand_mask, self.round_num, self.lead_suit, first_play, self.heart_broken, rules.lead_banned) >> index & 1:
+            reason = rules.play_error(chosen, player.hand_mask, self.round_num, self.lead_suit, first_play, self.heart_broken) if isinstance(chosen, str) else 'no card was chosen'
+            raise ValueError(f"{player.name} can't play {chosen!r}: {reason}")
+
+        card = player.remove_card_from_hand(chosen)
+
+        # record the card before the trick and hearts broken change, so the tracker can tell what it shows about the player's hand
+        # leading a heart only shows a hand of hearts if the rules ban leading them before they are broken
+        trick = self.current_trick
+        self.tracker.update(seat, index, trick[0].index // 13 if trick else None, self.heart_broken or not rules.lead_banned)
+
+        # the lead card decides the suit everyone else must follow
+        if first_play:
+            self.lead_suit = card.face[-1]
+            self.first_play = False
+
+        # check if heart is broken
+        if card.suit == 'hearts':
+            if timed and not self.heart_broken:
+                STATS.count('hearts_broken', player)
+            self.heart_broken = True
+
+        trick.append(card)
+        self.trick_players.append(seat)
+
+        if timed:
+            STATS.record('play_turn', start, player)
+
+        for listener in self.listeners:
+            listener.on_play(self, seat, card)
+
+        return card
+
+    # clear the trick ready for a new one and return the order the seats will play in
+    def start_trick(self):
+        # create a 'trick' deck and list of people who played that card
+        self.current_trick = []
+        self.trick_players = []
+        self.lead_suit = 'DHCS'
+        self.first_play = True
+
+        return get_turn_order(self.lead_index)
+
+    # play a single trick and return the seat of the winner
+    def play_trick(self):
+        # loop through each player to do their turn
+        for seat in self.start_trick():
+            self.play_turn(seat)
+
+        return self.finish_trick()
+
+    # give the finished trick to its winner and return the winner's seat
+    def finish_trick(self):
+        # give the trick to the player with the highest value in the lead suit
+        timed = STATS.enabled
+        if timed:
+            start = perf_counter_ns()
+
+        winner = self.trick_players[get_trick_winner(self.current_trick)]
+        self.players[winner].add_trick_cards(self.current_trick)
+        self.players[winner].tricks_won += 1
+
+        if timed:
+            STATS.record('trick', start)
+
+        for listener in self.listeners:
+            listener.on_trick(self, winner)
+
+        # set the new lead_index and increment round number
+        self.lead_index = winner
+        self.round_num += 1
+
+        return winner
+
+    # deal and play all 13 tricks, then add the hand's points to each player
+    def play_hand(self):
+        self.deal()
+
+        # play tricks until the hands are empty
+        while not self.hand_over():
+            self.play_trick()
+
+        self.score_hand()
+
+    # check if every card of the hand has been played
+    def hand_over(self):
+        return not self.players[0].hand_mask
+
+    # add the hand's points to each player
+    def score_hand(self):
+        if STATS.enabled:
+            STATS.count('hands')
+            for player in self.players:
+                if player.shot_the_moon():
+                    STATS.count('moons', player)
+
+        calculate_game_scores(self.players, self.rules)
+
+        for listener in self.listeners:
+            listener.on_hand_end(self)
+
+    # play hands until one player reaches the point limit and return the winners
+    def play_game(self):
+        while not self.game_over():
+            self.play_hand()
+
+        return get_winners(self.players)
+
+    # 52-bit mask of every card played so far this hand
+    @property
+    def played_mask(self):
+        return self.tracker.played
+
+    # check if any player has reached the point limit
+    def game_over(self):
+        return any(player.points >= self.point_limit for player in self.players)
@@ -0,0 +1,124 @@
+from Engine import GameListener
+from Instrument import STATS
+from time import perf_counter_ns
+from datetime import datetime
+import threading
+import json
+
+# number of buffered lines which triggers a write to disk
+BUFFER_SIZE = 256
+
+# logger which keeps its files open and writes lines in batches instead of opening the file for every event
+# text_file gets the human readable lines, json_file gets one JSON object per event, either can be None
+# if flush_interval is given a background thread also flushes the buffers every flush_interval seconds
+class GameLogger():
+    # open the files and start the flush thread if needed
+    def __init__(self, text_file=None, json_file=None, buffer_size=BUFFER_SIZE, flush_interval=None):
+        self.text_file = open(text_file, 'a') if text_file else None
+        self.json_file = open(json_file, 'a') if json_file else None
+        self.buffer_size = buffer_size
+        self.text_buffer = []
+        self.json_buffer = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+        if flush_interval:
+            self.thread = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True)
+            self.thread.start()
+
+    # add a human readable line to the log
+    def log(self, event):
+        if self.text_file is None:
+            return
+
+        timed = STATS.enabled
+        if timed:
+            start = perf_counter_ns()
+
+        with self.lock:
+            self.text_buffer.append(f"[{datetime.now().strftime('%H:%M:%S')}] {event}\n")
+            if len(self.text_buffer) >= self.buffer_size:
+                self._write()
+
+        if timed:
+            STATS.record('log', start)
+
+    # add a structured event to the log, e.g. event('play', seat=1, card='QS')
+    def event(self, kind, **fields):
+        if self.json_file is None:
+            return
+
+        timed = STATS.enabled
+        if timed:
+            start = perf_counter_ns()
+
+        with self.lock:
+            self.json_buffer.append(json.dumps({'event': kind, **fields}) + '\n')
+            if len(self.json_buffer) >= self.buffer_size:
+                self._write()
+
+        if timed:
+            STATS.record('log', start)
+
+    # write everything buffered so far to disk
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    # write the buffers, the lock must already be held
+    def _write(self):
+        if self.text_buffer:
+            self.text_file.writelines(self.text_buffer)
+            self.text_file.flush()
+            self.text_buffer.clear()
+        if self.json_buffer:
+            self.json_file.writelines(self.json_buffer)
+            self.json_file.flush()
+            self.json_buffer.clear()
+
+    # flush every interval until the logger is closed
+    def _flush_loop(self, interval):
+        while not self.stopped.wait(interval):
+            self.flush()
+
+    # stop the flush thread, write anything left and close the files
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+        self.flush()
+        for f in (self.text_file, self.json_file):
+            if f is not None:
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# listener which sends every deal, play, trick and hand score to a GameLogger
+class LogListener(GameListener):
+    # initialise with the logger to write to
+    def __init__(self, logger):
+        self.logger = logger
+
+    # record everyone's hand so the game can be replayed
+    def on_deal(self, engine):
+        self.logger.event('deal', players=[player.name for player in engine.players], hands=[[card.face for card in player.hand] for player in engine.players])
+
+    # log the card played
+    def on_play(self, engine, seat, card):
+        self.logger.log(f'{engine.players[seat].name} played {card.name}')
+        self.logger.event('play', round=engine.round_num, seat=seat, card=card.face)
+
+    # log who won the trick
+    def on_trick(self, engine, seat):
+        self.logger.log(f"{engine.players[seat].name} won this trick.\n")
+        self.logger.event('trick', round=engine.round_num, seat=seat, cards=[card.face for card in engine.current_trick])
+
+    # log everyone's points after the hand
+    def on_hand_end(self, engine):
+        self.logger.event('hand', points=[player.points for player in engine.players])
@@ -0,0 +1,159 @@
+from Engine import GameListener
+from Bitmask import card_index
+from array import array
+import mmap
+import os
+import struct
+
+# binary record of a hand, every record is a fixed RECORD_SIZE bytes so any hand can be found without reading the others
+#
+#   bytes 0-12   the deal, 2 bits per card giving the seat (0-3) which was dealt that card, card index order (see Bitmask.py)
+#   bytes 13-64  the 52 plays in the order they were made, one card index per byte
+#   bytes 65-68  points added to each seat's score by the hand, signed as the jack of diamonds rule can take points away
+#
+# who played each card isn't stored as it can be worked out from the deal
+# the file starts with a HEADER_SIZE byte header holding MAGIC, the format version and the record size
+
+MAGIC = b'HRTS'
+VERSION = 2
+DEAL_SIZE = 13
+PLAYS_SIZE = 52
+POINTS_SIZE = 4
+RECORD_SIZE = DEAL_SIZE + PLAYS_SIZE + POINTS_SIZE
+POINTS_FORMAT = f'{POINTS_SIZE}b'
+HEADER = MAGIC + bytes([VERSION, RECORD_SIZE, 0, 0])
+HEADER_SIZE = len(HEADER)
+
+# pack the seat holding each card into the deal bytes
+def encode_deal(hands):
+    packed = 0
+    for seat, hand in enumerate(hands):
+        for index in range(52):
+            if hand >> index & 1:
+                packed |= seat << (index * 2)
+    return packed.to_bytes(DEAL_SIZE, 'little')
+
+# unpack the deal bytes into the seat holding each card
+def decode_owners(deal):
+    packed = int.from_bytes(deal, 'little')
+    return [packed >> (index * 2) & 3 for index in range(52)]
+
+# unpack the deal bytes into a 52-bit hand mask for each seat
+def decode_deal(deal):
+    hands = [0, 0, 0, 0]
+    for index, seat in enumerate(decode_owners(deal)):
+        hands[seat] |= 1 << index
+    return hands
+
+# build a complete record
+def encode_record(hands, plays, points):
+    return encode_deal(hands) + bytes(plays) + struct.pack(POINTS_FORMAT, *points)
+
+# list the (seat, card index) of every play in a record, working out the players from the deal
+def replay(record):
+    owners = decode_owners(record[:DEAL_SIZE])
+    return [(owners[index], index) for index in record[DEAL_SIZE:DEAL_SIZE + PLAYS_SIZE]]
+
+# list the seat which won each trick in a record
+def trick_winners(record):
+    plays = record[DEAL_SIZE:DEAL_SIZE + PLAYS_SIZE]
+    owners = decode_owners(record[:DEAL_SIZE])
+    winners = []
+
+    for start in range(0, PLAYS_SIZE, 4):
+        trick = plays[start:start + 4]
+        lead = trick[0] // 13
+        winners.append(owners[max((index for index in trick if index // 13 == lead))])
+
+    return winners
+
+# get the points added to each seat by the hand in a record
+def record_points(record):
+    return list(struct.unpack(POINTS_FORMAT, record[DEAL_SIZE + PLAYS_SIZE:RECORD_SIZE]))
+
+# listener which appends a record to a file for every hand played
+class RecordWriter(GameListener):
+    # open the file, writing the header if it is new
+    def __init__(self, path):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'ab')
+        if new:
+            self.file.write(HEADER)
+
+        self.hands = None
+        self.plays = bytearray()
+        self.points = None
+
+    # remember the deal and everyone's points before the hand
+    def on_deal(self, engine):
+        self.hands = [player.hand_mask for player in engine.players]
+        self.plays.clear()
+        self.points = [player.points for player in engine.players]
+
+    # add the card to the plays
+    def on_play(self, engine, seat, card):
+        self.plays.append(card_index(card))
+
+    # write the record once the hand has been scored
+    def on_hand_end(self, engine):
+        points = [player.points - before for player, before in zip(engine.players, self.points)]
+        self.file.write(encode_record(self.hands, self.plays, points))
+
+    # close the file
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# memory-mapped reader over a record file, records are returned as memoryview slices of the file without copying
+# use bytes(record) to keep a record after the reader is closed, the file can't be closed while slices are still held
+class RecordReader():
+    # open and map the file, checking the header
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+        if self.view[:len(MAGIC)] != MAGIC or self.view[len(MAGIC)] != VERSION or self.view[len(MAGIC) + 1] != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} hand record file")
+
+    # number of hands in the file
+    def __len__(self):
+        return (len(self.view) - HEADER_SIZE) // RECORD_SIZE
+
+    # get a single record
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('record index out of range')
+
+        start = HEADER_SIZE + i * RECORD_SIZE
+        return self.view[start:start + RECORD_SIZE]
+
+    # iterate through every record in order
+    def __iter__(self):
+        for start in range(HEADER_SIZE, HEADER_SIZE + len(self) * RECORD_SIZE, RECORD_SIZE):
+            yield self.view[start:start + RECORD_SIZE]
+
+    # get the points one seat took in every hand as a single signed byte array, for quick scans over the whole file
+    def points_column(self, seat):
+        offset = HEADER_SIZE + DEAL_SIZE + PLAYS_SIZE + seat
+        return array('b', self.view[offset:offset + len(self) * RECORD_SIZE:RECORD_SIZE].tobytes())
+
+    # release the mapping and close the file
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,134 @@
+from time import perf_counter_ns
+
+# optional instrumentation of the game, records latency histograms and counters per player and per difficulty
+# every hook checks STATS.enabled first so it costs almost nothing while turned off
+#
+# latencies recorded: play_turn, make_choice (every bot decision), deal_deck, trick (resolving the winner) and log (GameLogger writes)
+# counters recorded: decisions, redeals (hands rejected by validate_hands), hearts_broken, moons and hands
+
+# latency histogram in nanoseconds, every power of 2 is split into 4 buckets so percentiles are within 25%
+class Histogram():
+    # initialise the buckets and totals
+    def __init__(self):
+        self.buckets = [0] * 256
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    # add a time in nanoseconds
+    def add(self, ns):
+        self.buckets[bucket_index(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    # add all the times of another histogram
+    def merge(self, other):
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    # estimate a percentile in nanoseconds, using the upper bound of the bucket it falls in
+    def percentile(self, p):
+        target = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(self.max, bucket_limit(i))
+        return self.max
+
+# find the bucket for a time, the top 3 bits of the time pick the power of 2 and which quarter of it
+def bucket_index(ns):
+    bits = ns.bit_length()
+    if bits < 3:
+        return ns
+    return (bits << 2) | (ns >> (bits - 3) & 3)
+
+# largest time which goes in a bucket
+def bucket_limit(index):
+    bits, quarter = index >> 2, index & 3
+    if bits < 3:
+        return index
+    return ((5 + quarter) << (bits - 3)) - 1
+
+# collection of counters and histograms keyed by name and then by ('player', name) / ('difficulty', level) / ('all', None)
+class Instruments():
+    # initialise with nothing recorded
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.histograms = {}
+
+    # clear everything recorded so far
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    # the keys a player's events are recorded under
+    def player_keys(self, player):
+        if player is None:
+            return [('all', None)]
+        return [('all', None), ('player', player.name), ('difficulty', player.difficulty if player.is_bot else 'human')]
+
+    # add n to a counter for a player (or just the overall total if player is None)
+    def count(self, name, player=None, n=1):
+        counters = self.counters.setdefault(name, {})
+        for key in self.player_keys(player):
+            counters[key] = counters.get(key, 0) + n
+
+    # add a latency measured from start (a perf_counter_ns value) to now
+    def record(self, name, start, player=None):
+        ns = perf_counter_ns() - start
+        histograms = self.histograms.setdefault(name, {})
+        for key in self.player_keys(player):
+            if key not in histograms:
+                histograms[key] = Histogram()
+            histograms[key].add(ns)
+
+    # add everything recorded by another Instruments, e.g. one sent back from a worker process
+    def merge(self, other):
+        for name, counters in other.counters.items():
+            mine = self.counters.setdefault(name, {})
+            for key, n in counters.items():
+                mine[key] = mine.get(key, 0) + n
+
+        for name, histograms in other.histograms.items():
+            mine = self.histograms.setdefault(name, {})
+            for key, histogram in histograms.items():
+                if key not in mine:
+                    mine[key] = Histogram()
+                mine[key].merge(histogram)
+
+    # build a readable summary of everything recorded
+    def summary(self):
+        lines = [f"\n{'Latency':<28}{'calls':>10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+        for name, histograms in sorted(self.histograms.items()):
+            for key, h in sorted(histograms.items(), key=lambda item: str(item[0])):
+                label = name if key[0] == 'all' else f"  {key[0]} {key[1]}"
+                lines.append(f"{label:<28}{h.count:>10}{h.total / h.count / 1000:>10.2f}{h.percentile(50) / 1000:>10.2f}{h.percentile(99) / 1000:>10.2f}{h.max / 1000:>10.2f}")
+
+        lines.append(f"\n{'Counter':<28}{'count':>10}")
+        for name, counters in sorted(self.counters.items()):
+            for key, n in sorted(counters.items(), key=lambda item: str(item[0])):
+                label = name if key[0] == 'all' else f"  {key[0]} {key[1]}"
+                lines.append(f"{label:<28}{n:>10}")
+
+        return '\n'.join(lines) + '\n'
+
+    # print the summary, or write it to a file
+    def dump(self, file=None):
+        if file is None:
+            print(self.summary())
+        else:
+            with open(file, 'w') as f:
+                f.write(self.summary())
+
+# the shared instruments used by every hook
+STATS = Instruments()
+
+# turn recording on or off
+def enable(enabled=True):
+    STATS.enabled = enabled
@@ -0,0 +1,458 @@
+from Engine import GameEngine, GameListener
+from Rules import POINT_LIMIT
+from Bot import make_choice
+from Player import Player
+from Bitmask import CARDS, FACE_INDEX, indexes_from_mask, popcount
+from multiprocessing import Pool
+import numpy as np
+import argparse
+import random
+import glob
+import time
+import os
+
+# difficulty 5, a bot which scores every legal card with a small learned model and plays the card expected to cost the fewest points
+# the model is a one hidden layer neural network (or a linear model with hidden=0) written with numpy, it is trained by playing
+# games against itself: python Learned.py generate --games 20000 --out data, then python Learned.py train --data data
+#
+# cards are described by the features below, worked out for every card of every position at once, so a whole batch of games
+# (see BatchSim.py) or just the legal cards of one bot are scored with a couple of matrix products
+#
+# the model predicts the points the player will take from the current trick to the end of the hand, less the average taken
+# by the other players (so shooting the moon counts as -26), and is trained on the card the player actually chose
+#
+# weight files are numpy .npz files holding:
+#   version   the format version, FORMAT_VERSION
+#   features  the names of the features the model was trained on, in order
+#   mean, std the mean and standard deviation used to normalise each feature
+#   w1, b1    the hidden layer weights (features, hidden) and biases (hidden), missing in a linear model
+#   w2, b2    the output weights (hidden or features,) and bias ()
+
+FORMAT_VERSION = 1
+
+# weights used by difficulty 5 unless another file is loaded
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weights', 'learned.npz')
+
+# rows of training data written to each chunk file
+CHUNK_ROWS = 65536
+
+FEATURES = [
+    'bias', 'value', 'clubs', 'diamonds', 'spades', 'hearts', 'card_points', 'queen_spades', 'high_spade',
+    'leading', 'following', 'discarding', 'winning', 'points_if_won', 'trick_points', 'still_to_play', 'winning_value',
+    'higher_unseen', 'lower_unseen', 'suit_held', 'suit_unseen', 'higher_held', 'queen_out', 'high_spade_queen_out',
+    'hearts_broken', 'round', 'taken', 'others_taken', 'only_taker', 'game_points', 'leader_points',
+]
+
+INDEXES = np.arange(52)
+VALUES = INDEXES % 13
+SUITS = INDEXES // 13
+CARD_POINTS = np.where(INDEXES >= 39, 1, 0) + np.where(INDEXES == 36, 13, 0)
+QS_INDEX = 36
+
+# same_suit[i, j] is True when card j is the same suit as card i and above[i, j] when it is also higher
+SAME_SUIT = SUITS[:, None] == SUITS[None, :]
+ABOVE = SAME_SUIT & (INDEXES[None, :] > INDEXES[:, None])
+BELOW = SAME_SUIT & (INDEXES[None, :] < INDEXES[:, None])
+
+# features of every card for a batch of n positions, returned as an (n, 52, features) array
+# hand and played are (n, 52) boolean arrays, played holding every card played this hand including the current trick
+# trick is an (n, 4) array of the card indexes played to the trick so far, -1 for the cards still to come
+# taken and points are (n, 4) arrays of the points taken this hand and the game scores, with the player's own in column 0
+def card_features(hand, played, trick, taken, points, heart_broken, round_num, point_limit=POINT_LIMIT):
+    n = len(hand)
+    features = np.empty((n, 52, len(FEATURES)), dtype=np.float32)
+    hand_f = hand.astype(np.float32)
+    unseen_f = (~hand & ~played).astype(np.float32)
+
+    size = (trick >= 0).sum(axis=1)
+    lead = np.where(size > 0, trick[:, 0] // 13, -1)
+    in_lead = (trick >= 0) & (trick // 13 == lead[:, None])
+    winning = np.where(in_lead, trick, -1).max(axis=1)
+    trick_points = np.where(trick >= 0, CARD_POINTS[trick], 0).sum(axis=1)
+
+    leading = (size == 0)[:, None]
+    following = ~leading & (SUITS[None, :] == lead[:, None])
+    wins = leading | (following & (INDEXES[None, :] > winning[:, None]))
+
+    features[:, :, 0] = 1
+    features[:, :, 1] = VALUES / 12
+    features[:, :, 2:6] = SUITS[None, :, None] == np.arange(4)
+    features[:, :, 6] = CARD_POINTS / 13
+    features[:, :, 7] = INDEXES == QS_INDEX
+    features[:, :, 8] = (INDEXES == 37) | (INDEXES == 38)
+    features[:, :, 9] = leading
+    features[:, :, 10] = following
+    features[:, :, 11] = ~leading & ~following
+    features[:, :, 12] = wins
+    features[:, :, 13] = wins * (trick_points[:, None] + CARD_POINTS) / 13
+    features[:, :, 14] = (trick_points / 13)[:, None]
+    features[:, :, 15] = ((3 - size) / 3)[:, None]
+    features[:, :, 16] = np.where(size > 0, winning % 13 / 12, 0)[:, None]
+    features[:, :, 17] = unseen_f @ ABOVE.T.astype(np.float32) / 12
+    features[:, :, 18] = unseen_f @ BELOW.T.astype(np.float32) / 12
+    features[:, :, 19] = hand_f @ SAME_SUIT.astype(np.float32) / 13
+    features[:, :, 20] = unseen_f @ SAME_SUIT.astype(np.float32) / 13
+    features[:, :, 21] = hand_f @ ABOVE.T.astype(np.float32) / 12
+
+    queen_out = unseen_f[:, QS_INDEX][:, None]
+    features[:, :, 22] = queen_out
+    features[:, :, 23] = queen_out * features[:, :, 8]
+    features[:, :, 24] = np.reshape(heart_broken, (-1, 1))
+    features[:, :, 25] = np.reshape(round_num, (-1, 1)) / 13
+
+    others = taken[:, 1:].max(axis=1)
+    features[:, :, 26] = (taken[:, 0] / 26)[:, None]
+    features[:, :, 27] = (others / 26)[:, None]
+    features[:, :, 28] = ((taken[:, 0] > 0) & (others == 0))[:, None]
+    features[:, :, 29] = (points[:, 0] / point_limit)[:, None]
+    features[:, :, 30] = ((points[:, 1:].max(axis=1) - points[:, 0]) / point_limit)[:, None]
+
+    return features
+
+# features which only depend on the card, and masks of the cards above, below and in the same suit as each card
+STATIC_ROWS = [[float(value) for value in (1, VALUES[i] / 12, *(SUITS[i] == np.arange(4)), CARD_POINTS[i] / 13, i == QS_INDEX, i in (37, 38))] for i in range(52)]
+ABOVE_MASKS = [int(sum(1 << int(j) for j in np.nonzero(ABOVE[i])[0])) for i in range(52)]
+BELOW_MASKS = [int(sum(1 << int(j) for j in np.nonzero(BELOW[i])[0])) for i in range(52)]
+SUIT_MASKS = [((1 << 13) - 1) << (i // 13 * 13) for i in range(52)]
+POINTS_OF = [int(points) for points in CARD_POINTS]
+
+# the same features as card_features for the given cards of a single position, returned as a (cards, features) array
+# numpy is slow for small arrays so working them out with masks is much quicker for one bot's decision
+# hand and played are 52-bit masks, trick is a list of card indexes and taken and points are lists with the player's own first
+def position_features(cards, hand, played, trick, taken, points, heart_broken, round_num, point_limit=POINT_LIMIT):
+    unseen = ((1 << 52) - 1) & ~hand & ~played
+    size = len(trick)
+    trick_points = sum(POINTS_OF[card] for card in trick)
+    lead = trick[0] // 13 if size else -1
+    winning = max(card for card in trick if card // 13 == lead) if size else -1
+    queen_out = unseen >> QS_INDEX & 1
+    others = max(taken[1:])
+
+    # features which are the same for every card
+    trick_row = [trick_points / 13, (3 - size) / 3, winning % 13 / 12 if size else 0]
+    position_row = [heart_broken, round_num / 13, taken[0] / 26, others / 26, taken[0] > 0 and others == 0,
+                    points[0] / point_limit, (max(points[1:]) - points[0]) / point_limit]
+
+    rows = []
+    for card in cards:
+        following = size and card // 13 == lead
+        wins = not size or (following and card > winning)
+        suit = SUIT_MASKS[card]
+        rows.append(STATIC_ROWS[card] + [not size, following, size and not following, wins, wins * (trick_points + POINTS_OF[card]) / 13]
+                    + trick_row + [popcount(unseen & ABOVE_MASKS[card]) / 12, popcount(unseen & BELOW_MASKS[card]) / 12,
+                    popcount(hand & suit) / 13, popcount(unseen & suit) / 13, popcount(hand & ABOVE_MASKS[card]) / 12,
+                    queen_out, queen_out and card in (37, 38)] + position_row)
+
+    return np.array(rows, dtype=np.float32)
+
+# features of the given cards for the bot in the given seat of a GameEngine
+def engine_features(engine, seat, cards):
+    players = engine.players
+    order = [(seat + i) % 4 for i in range(4)]
+
+    return position_features(
+        cards,
+        players[seat].hand_mask,
+        engine.tracker.played,
+        [card.index for card in engine.current_trick],
+        [players[i].get_trick_points() for i in order],
+        [players[i].points for i in order],
+        engine.heart_broken,
+        engine.round_num,
+        engine.point_limit,
+    )
+
+# a trained model which predicts the points each card will cost
+class LearnedModel():
+    # initialise from the arrays of a weight file
+    def __init__(self, mean, std, w2, b2, w1=None, b1=None):
+        self.mean = mean.astype(np.float32)
+        self.std = np.where(std > 1e-6, std, 1).astype(np.float32)
+        self.w1 = None if w1 is None else w1.astype(np.float32)
+        self.b1 = None if b1 is None else b1.astype(np.float32)
+        self.w2 = w2.astype(np.float32)
+        self.b2 = np.float32(b2)
+
+    # load a weight file, checking it matches this version of the features
+    @classmethod
+    def load(cls, path=DEFAULT_WEIGHTS):
+        with np.load(path) as data:
+            if int(data['version']) != FORMAT_VERSION or list(data['features']) != FEATURES:
+                raise ValueError(f'{path} was trained with different features, train a new model with Learned.py train')
+            hidden = {'w1': data['w1'], 'b1': data['b1']} if 'w1' in data else {}
+            return cls(data['mean'], data['std'], data['w2'], data['b2'], **hidden)
+
+    # write the model to a weight file
+    def save(self, path):
+        arrays = {'version': FORMAT_VERSION, 'features': np.array(FEATURES), 'mean': self.mean, 'std': self.std, 'w2': self.w2, 'b2': self.b2}
+        if self.w1 is not None:
+            arrays.update(w1=self.w1, b1=self.b1)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, **arrays)
+
+    # predicted cost of each row of features, any leading shape is kept
+    def predict(self, features):
+        x = (features - self.mean) / self.std
+        if self.w1 is not None:
+            x = np.maximum(x @ self.w1 + self.b1, 0)
+        return x @ self.w2 + self.b2
+
+    # choose the card with the lowest predicted cost for each position, legal is an (n, 52) boolean array
+    def choose(self, features, legal):
+        rows, cards = np.nonzero(legal)
+        costs = np.full(legal.shape, np.inf, dtype=np.float32)
+        costs[rows, cards] = self.predict(features[rows, cards])
+        return costs.argmin(axis=1)
+
+# model used by difficulty 5, loaded the first time it is needed
+default_model = None
+
+# get the model used by difficulty 5
+def get_model():
+    global default_model
+    if default_model is None:
+        default_model = LearnedModel.load()
+    return default_model
+
+# legal moves of the player in the given seat as a mask
+def engine_legal_moves(engine, seat):
+    return engine.rules.legal_moves(engine.players[seat].hand_mask, engine.round_num, engine.lead_suit, engine.first_play, engine.heart_broken if engine.first_play else True)
+
+# choose the face of the card for a difficulty 5 bot in the given seat, only the legal cards are scored
+def learned_choice(engine, seat, model=None):
+    cards = indexes_from_mask(engine_legal_moves(engine, seat))
+    if len(cards) == 1:
+        return CARDS[cards[0]].face
+    costs = (model or get_model()).predict(engine_features(engine, seat, cards))
+    return CARDS[cards[int(costs.argmin())]].face
+
+# writes rows of training data to numbered .npz chunk files (x features, y targets) so no more than one chunk is held in memory
+class ChunkWriter():
+    # initialise with the directory and a prefix which keeps the files of different writers apart
+    def __init__(self, directory, prefix, rows=CHUNK_ROWS):
+        self.directory = directory
+        self.prefix = prefix
+        self.rows = rows
+        self.x = []
+        self.y = []
+        self.held = 0
+        self.total = 0
+        self.chunks = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # add rows of features and their targets, writing a chunk when there are enough
+    def add(self, x, y):
+        self.x.append(x)
+        self.y.append(y)
+        self.held += len(y)
+        self.total += len(y)
+        if self.held >= self.rows:
+            self.flush()
+
+    # write everything held to a new chunk file
+    def flush(self):
+        if not self.held:
+            return
+        path = os.path.join(self.directory, f'{self.prefix}_{self.chunks:04d}.npz')
+        np.savez(path, x=np.concatenate(self.x), y=np.concatenate(self.y).astype(np.float32))
+        self.chunks += 1
+        self.x, self.y, self.held = [], [], 0
+
+# agent and listener which plays self-play games and records the features of every card chosen with its target
+# cards are chosen by the given model, or by the player's difficulty (1-3) without one, and a random legal card is played epsilon of the time
+class SelfPlayRecorder(GameListener):
+    # initialise with the writer the rows go to
+    def __init__(self, writer, rng, model=None, epsilon=0.1):
+        self.writer = writer
+        self.rng = rng
+        self.model = model
+        self.epsilon = epsilon
+        self.pending = []
+        self.start_points = [0, 0, 0, 0]
+
+    # choose and record a card for the given seat
+    def __call__(self, engine, seat):
+        player = engine.players[seat]
+        cards = indexes_from_mask(engine_legal_moves(engine, seat))
+        features = engine_features(engine, seat, cards)
+
+        if self.rng.random() < self.epsilon:
+            choice = self.rng.randrange(len(cards))
+        elif self.model is not None:
+            choice = int(self.model.predict(features).argmin())
+        else:
+            choice = cards.index(FACE_INDEX[make_choice(player, engine.round_num, engine.lead_suit, engine.heart_broken, engine.first_play, engine.current_trick)])
+
+        # the target is the change in the player's share of the points from this trick to the end of the hand
+        taken = [other.get_trick_points() for other in engine.players]
+        self.pending.append((seat, features[choice], relative_points(taken, seat)))
+        return CARDS[cards[choice]].face
+
+    # remember the scores at the start of each hand
+    def on_deal(self, engine):
+        self.start_points = [player.points for player in engine.players]
+        self.pending = []
+
+    # the hand's points (after any moon) are known, so the targets of its decisions can be written
+    def on_hand_end(self, engine):
+        scored = [player.points - start for player, start in zip(engine.players, self.start_points)]
+        if self.pending:
+            x = np.array([features for _, features, _ in self.pending])
+            y = np.array([relative_points(scored, seat) - before for seat, _, before in self.pending])
+            self.writer.add(x, y)
+        self.pending = []
+
+# points of a seat less the average of the others
+def relative_points(points, seat):
+    return points[seat] - (sum(points) - points[seat]) / 3
+
+# play a range of self-play games and write their data, this is run in the worker processes
+# returns the number of rows written
+def generate_games(job):
+    directory, seed, start, stop, weights, epsilon, rows = job
+    rng = random.Random(seed * 1000003 + start)
+    model = LearnedModel.load(weights) if weights else None
+    writer = ChunkWriter(directory, f'chunk_{seed}_{start:08d}', rows)
+    recorder = SelfPlayRecorder(writer, rng, model, epsilon)
+
+    for _ in range(start, stop):
+        players = [Player(f'Bot {i+1}', True) for i in range(4)]
+        for player in players:
+            player.set_difficulty(3)
+        GameEngine(players, agents=[recorder] * 4, listeners=[recorder], rng=rng).play_game()
+
+    writer.flush()
+    return writer.total
+
+# play self-play games across a pool of workers, writing chunk files to the directory, returns the number of rows written
+# weights is a weight file to choose the cards with, otherwise difficulty 3 is used
+def generate(directory, games, seed=0, weights=None, epsilon=0.1, processes=None, games_per_job=500, rows=CHUNK_ROWS):
+    jobs = [(directory, seed, start, min(start + games_per_job, games), weights, epsilon, rows) for start in range(0, games, games_per_job)]
+    with Pool(processes) as pool:
+        return sum(pool.imap_unordered(generate_games, jobs))
+
+# chunk files of a data directory in a fixed order, every holdout-th one is kept back to check the model on
+def chunk_files(directory, holdout=10):
+    files = sorted(glob.glob(os.path.join(directory, '*.npz')))
+    if not files:
+        raise FileNotFoundError(f'no training data in {directory}, create some with Learned.py generate')
+    if len(files) < 2:
+        return files, files
+    return [f for i, f in enumerate(files) if i % holdout != holdout - 1 or i == 0], files[holdout - 1::holdout] or files[-1:]
+
+# load the x and y arrays of a chunk file
+def load_chunk(path):
+    with np.load(path) as data:
+        return data['x'].astype(np.float32), data['y'].astype(np.float32)
+
+# mean and standard deviation of every feature, reading one chunk at a time
+def feature_stats(files):
+    count = 0
+    total = np.zeros(len(FEATURES))
+    squares = np.zeros(len(FEATURES))
+    for path in files:
+        x, _ = load_chunk(path)
+        count += len(x)
+        total += x.sum(axis=0, dtype=np.float64)
+        squares += (x.astype(np.float64) ** 2).sum(axis=0)
+    mean = total / count
+    return mean, np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+
+# mean squared error of a model over chunk files
+def evaluate(model, files):
+    error = 0.0
+    count = 0
+    for path in files:
+        x, y = load_chunk(path)
+        error += float(((model.predict(x) - y) ** 2).sum())
+        count += len(y)
+    return error / count
+
+# train a model on the chunk files in a directory with minibatch Adam, streaming one chunk at a time
+# hidden is the size of the hidden layer, 0 trains a linear model
+def train(directory, hidden=32, epochs=5, batch_size=256, rate=0.001, seed=0, log=print):
+    rng = np.random.default_rng(seed)
+    files, holdout = chunk_files(directory)
+    mean, std = feature_stats(files)
+    features = len(FEATURES)
+
+    if hidden:
+        model = LearnedModel(mean, std, rng.normal(0, 1 / np.sqrt(hidden), hidden), 0.0, rng.normal(0, np.sqrt(2 / features), (features, hidden)), np.zeros(hidden))
+        params = ['w1', 'b1', 'w2', 'b2']
+    else:
+        model = LearnedModel(mean, std, np.zeros(features), 0.0)
+        params = ['w2', 'b2']
+
+    # Adam moment estimates for every parameter
+    moments = {name: (np.zeros_like(getattr(model, name)), np.zeros_like(getattr(model, name))) for name in params}
+    beta1, beta2, step = 0.9, 0.999, 0
+
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        for path in rng.permutation(files):
+            x, y = load_chunk(path)
+            x = (x - model.mean) / model.std
+            order = rng.permutation(len(y))
+
+            for batch in range(0, len(y), batch_size):
+                rows = order[batch:batch + batch_size]
+                grads = gradients(model, x[rows], y[rows])
+                step += 1
+                for name in params:
+                    m, v = moments[name]
+                    m *= beta1
+                    m += (1 - beta1) * grads[name]
+                    v *= beta2
+                    v += (1 - beta2) * grads[name] ** 2
+                    update = rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + 1e-8)
+                    setattr(model, name, (getattr(model, name) - update).astype(np.float32))
+
+        log(f'epoch {epoch + 1}: holdout error {evaluate(model, holdout):.3f} ({time.perf_counter() - start:.1f}s)')
+
+    return model
+
+# gradients of the mean squared error for a batch of normalised features
+def gradients(model, x, y):
+    if model.w1 is None:
+        error = x @ model.w2 + model.b2 - y
+        return {'w2': x.T @ error * (2 / len(y)), 'b2': np.float32(2 * error.mean())}
+
+    hidden = np.maximum(x @ model.w1 + model.b1, 0)
+    error = (hidden @ model.w2 + model.b2 - y) * (2 / len(y))
+    back = np.outer(error, model.w2) * (hidden > 0)
+    return {'w1': x.T @ back, 'b1': back.sum(axis=0), 'w2': hidden.T @ error, 'b2': np.float32(error.sum())}
+
+# read the command line options and generate data or train a model
+def main():
+    parser = argparse.ArgumentParser(description='Create self-play data for the learned bot (difficulty 5) and train its model.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = commands.add_parser('generate', help='play self-play games and write their training data')
+    generate_parser.add_argument('--games', type=int, default=20000, help='number of games to play')
+    generate_parser.add_argument('--out', default='data', help='directory the chunk files are written to')
+    generate_parser.add_argument('--weights', help='choose cards with this model instead of difficulty 3')
+    generate_parser.add_argument('--epsilon', type=float, default=0.1, help='chance of playing a random legal card instead')
+    generate_parser.add_argument('--seed', type=int, default=0, help='seed for the deals and random plays')
+    generate_parser.add_argument('--processes', type=int, default=os.cpu_count(), help='number of worker processes')
+
+    train_parser = commands.add_parser('train', help='train a model on generated data')
+    train_parser.add_argument('--data', default='data', help='directory of chunk files')
+    train_parser.add_argument('--out', default=DEFAULT_WEIGHTS, help='weight file to write')
+    train_parser.add_argument('--hidden', type=int, default=32, help='size of the hidden layer, 0 for a linear model')
+    train_parser.add_argument('--epochs', type=int, default=5, help='number of passes over the data')
+    train_parser.add_argument('--rate', type=float, default=0.001, help='learning rate')
+    train_parser.add_argument('--seed', type=int, default=0, help='seed for the weights and the order of the data')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'generate':
+        rows = generate(args.out, args.games, args.seed, args.weights, args.epsilon, args.processes)
+        print(f'Wrote {rows} rows to {args.out} in {time.perf_counter() - start:.1f}s')
+    else:
+        model = train(args.data, args.hidden, args.epochs, rate=args.rate, seed=args.seed)
+        model.save(args.out)
+        print(f'Saved the model to {args.out} in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import json
+import mmap
+import os
+import re
+import time
+
+# query the text logs every interactive game writes to logs/ (see create_log_folder in hearts.py)
+# each log is read once, a line at a time from a memory map, into a short summary of every game in it, and the summaries are kept
+# in an index file in the log folder. later runs only read logs which are new or have changed size or time since they were indexed,
+# so queries over months of games just load the index and add up the summaries
+#
+# a game summary is a dict of
+#   difficulty   difficulty of the bots, None for logs written before it was logged
+#   rules        description of the house rules from the log's Rules: line (see Rules.Variant.describe), None for standard games
+#   finished     True if the game was played to the end
+#   hands        number of complete hands
+#   winners      names of the players with the lowest score at the end, empty if the game wasn't finished
+#   players      each player's name mapped to [points, tricks won, queens of spades taken, moons shot]
+#
+# points are worked out from the standard card values, so games played with house rules are left out of the queries
+# unless --house-rules is given
+
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 2
+
+# positions in a player's stats list
+POINTS, TRICKS, QUEENS, MOONS = range(4)
+
+PLAY_LINE = re.compile(rb'\[[\d:]+\] (.+) played (\w+) of (\w+)$')
+TRICK_LINE = re.compile(rb'\[[\d:]+\] (.+) won this trick\.$')
+DIFFICULTY_LINE = re.compile(rb'\[[\d:]+\] Bot difficulty (\d+)$')
+RULES_LINE = re.compile(rb'\[[\d:]+\] Rules: (.+)$')
+WIN_LINE = re.compile(rb'.+ WON!$')
+DRAW_LINE = re.compile(rb'ITS A DRAW$')
+
+# penalty points of a card from the value and suit words of a log line, e.g. b'Queen', b'spades'
+def card_points(value, suit):
+    suit = suit.lower()
+    if suit == b'hearts':
+        return 1
+    return 13 if value == b'Queen' and suit == b'spades' else 0
+
+# reads the games out of a log's lines one at a time
+class LogParser():
+    # initialise with no games
+    def __init__(self):
+        self.games = []
+        self.game = None
+        self.difficulty = None
+        self.rules = None
+        self.trick_points = 0
+        self.queen = False
+        self.hand = {}
+
+    # start a new game, an unfinished game before it is kept as it is
+    def start_game(self):
+        self.end_game(False)
+        self.game = {'difficulty': self.difficulty, 'rules': self.rules, 'finished': False, 'hands': 0, 'winners': [], 'players': {}}
+        self.hand = {}
+
+    # add the current game to the list of games
+    def end_game(self, finished):
+        if self.game is None:
+            return
+        game = self.game
+        if finished:
+            game['finished'] = True
+            lowest = min(stats[POINTS] for stats in game['players'].values())
+            game['winners'] = [name for name, stats in game['players'].items() if stats[POINTS] == lowest]
+        self.games.append(game)
+        self.game = None
+        self.difficulty = None
+        self.rules = None
+
+    # score a complete hand, counting a shot moon as 26 for everyone else
+    def end_hand(self):
+        players = self.game['players']
+        shooter = next((name for name, taken in self.hand.items() if taken == 26), None)
+        for name, stats in players.items():
+            if shooter is None:
+                stats[POINTS] += self.hand.get(name, 0)
+            elif name != shooter:
+                stats[POINTS] += 26
+        if shooter is not None:
+            players[shooter][MOONS] += 1
+        self.game['hands'] += 1
+        self.hand = {}
+
+    # read one line of a log, without its line ending
+    def feed(self, line):
+        match = PLAY_LINE.match(line)
+        if match:
+            if self.game is None:
+                self.start_game()
+            name = match.group(1).decode(errors='replace')
+            self.game['players'].setdefault(name, [0, 0, 0, 0])
+            points = card_points(match.group(2), match.group(3))
+            self.trick_points += points
+            self.queen |= points == 13
+            return
+
+        match = TRICK_LINE.match(line)
+        if match and self.game is not None:
+            name = match.group(1).decode(errors='replace')
+            stats = self.game['players'].setdefault(name, [0, 0, 0, 0])
+            stats[TRICKS] += 1
+            stats[QUEENS] += self.queen
+            self.hand[name] = self.hand.get(name, 0) + self.trick_points
+            self.trick_points = 0
+            self.queen = False
+            if sum(stats[TRICKS] for stats in self.game['players'].values()) % 13 == 0:
+                self.end_hand()
+            return
+
+        match = DIFFICULTY_LINE.match(line)
+        if match:
+            self.end_game(False)
+            self.difficulty = int(match.group(1))
+            return
+
+        # hearts.py logs the house rules straight after the difficulty, before the game's first card
+        match = RULES_LINE.match(line)
+        if match:
+            self.rules = match.group(1).decode(errors='replace')
+            return
+
+        if (WIN_LINE.match(line) or DRAW_LINE.match(line)) and self.game is not None:
+            self.end_game(True)
+
+    # list the games read so far, including one still being played
+    def finish(self):
+        self.end_game(False)
+        return self.games
+
+# read every game in a log file, streaming its lines from a memory map
+def parse_log(path):
+    parser = LogParser()
+    with open(path, 'rb') as f:
+        # empty files can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for line in iter(data.readline, b''):
+                parser.feed(line.rstrip(b'\r\n'))
+    return parser.finish()
+
+# load the index of a log folder, an empty index if there isn't one or it was written by another version
+def load_index(folder):
+    try:
+        with open(os.path.join(folder, INDEX_FILE)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {'version': INDEX_VERSION, 'files': {}}
+    if index.get('version') != INDEX_VERSION:
+        return {'version': INDEX_VERSION, 'files': {}}
+    return index
+
+# write the index, replacing the old one in one step so a crash never leaves half an index
+def save_index(folder, index):
+    path = os.path.join(folder, INDEX_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+# bring the index of a log folder up to date, reading only new and changed logs and dropping deleted ones
+# returns the index and the number of logs read
+def update_index(folder, rebuild=False):
+    index = {'version': INDEX_VERSION, 'files': {}} if rebuild else load_index(folder)
+    files = index['files']
+    seen = set()
+    read = 0
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.txt') or not entry.is_file():
+                continue
+            seen.add(entry.name)
+            info = entry.stat()
+            known = files.get(entry.name)
+            if known is not None and known['size'] == info.st_size and known['mtime'] == info.st_mtime_ns:
+                continue
+            files[entry.name] = {'size': info.st_size, 'mtime': info.st_mtime_ns, 'games': parse_log(entry.path)}
+            read += 1
+
+    removed = files.keys() - seen
+    for name in removed:
+        del files[name]
+
+    if read or removed or rebuild:
+        save_index(folder, index)
+    return index, read
+
+# every game in the index, in log name order
+def all_games(index):
+    for name in sorted(index['files']):
+        yield from index['files'][name]['games']
+
+# totals over every game for each player name: games, finished games, wins, hands, points, tricks, queens and moons
+def player_totals(games):
+    totals = {}
+    for game in games:
+        for name, stats in game['players'].items():
+            total = totals.setdefault(name, {'games': 0, 'finished': 0, 'wins': 0, 'hands': 0, 'points': 0, 'tricks': 0, 'queens': 0, 'moons': 0})
+            total['games'] += 1
+            total['finished'] += game['finished']
+            total['wins'] += name in game['winners']
+            total['hands'] += game['hands']
+            total['points'] += stats[POINTS]
+            total['tricks'] += stats[TRICKS]
+            total['queens'] += stats[QUEENS]
+            total['moons'] += stats[MOONS]
+    return totals
+
+# totals for one player grouped by the difficulty of the bots they played, None for games from before difficulties were logged
+def difficulty_totals(games, player):
+    groups = {}
+    for game in games:
+        groups.setdefault(game['difficulty'], []).append(game)
+    return {difficulty: player_totals(group).get(player) for difficulty, group in groups.items()}
+
+# display the number of logs, games and hands in the index
+def display_summary(index):
+    games = list(all_games(index))
+    finished = sum(game['finished'] for game in games)
+    hands = sum(game['hands'] for game in games)
+    house = sum(game['rules'] is not None for game in games)
+    print(f"{len(index['files'])} logs, {len(games)} games ({finished} finished, {house} with house rules), {hands} hands")
+
+# display a row of totals, rates are per hand played and per finished game
+def display_row(label, total, width):
+    hands = max(total['hands'], 1)
+    win_rate = total['wins'] / total['finished'] if total['finished'] else 0.0
+    print(f"{label:<{width}}{total['games']:>8}{win_rate:>10.1%}{total['points'] / hands:>12.2f}{total['queens'] / hands:>10.3f}{total['moons']:>8}")
+
+# display the totals of every player, most games first
+def display_players(games):
+    totals = player_totals(games)
+    width = max([len(name) for name in totals] + [6]) + 2
+    print(f"{'Player':<{width}}{'Games':>8}{'Win rate':>10}{'Points/hand':>12}{'QS/hand':>10}{'Moons':>8}")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['games']):
+        display_row(name, total, width)
+
+# display one player's totals for each difficulty
+def display_difficulties(games, player):
+    totals = difficulty_totals(games, player)
+    print(f"{player} by difficulty\n")
+    print(f"{'Difficulty':<12}{'Games':>8}{'Win rate':>10}{'Points/hand':>12}{'QS/hand':>10}{'Moons':>8}")
+    for difficulty in sorted(totals, key=lambda d: -1 if d is None else d):
+        if totals[difficulty] is not None:
+            display_row('unknown' if difficulty is None else str(difficulty), totals[difficulty], 12)
+
+# read the command line options, update the index and answer the query
+def main():
+    parser = argparse.ArgumentParser(description='Answer questions about the games in the log folder, using an index which is updated as logs are added.')
+    parser.add_argument('query', nargs='?', default='summary', choices=('summary', 'players', 'difficulty'),
+                        help='summary counts the games, players shows totals for each player, difficulty shows one player by bot difficulty')
+    parser.add_argument('--dir', default='logs', help='folder holding the logs')
+    parser.add_argument('--player', default='You', help='player shown by the difficulty query')
+    parser.add_argument('--finished', action='store_true', help='only count games played to the end')
+    parser.add_argument('--house-rules', action='store_true', help='also count games played with house rules, scored with the standard card values')
+    parser.add_argument('--rebuild', action='store_true', help='read every log again instead of using the index')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        parser.error(f'no log folder {args.dir}')
+
+    start = time.perf_counter()
+    index, read = update_index(args.dir, args.rebuild)
+    games = [game for game in all_games(index) if (game['finished'] or not args.finished) and (game['rules'] is None or args.house_rules)]
+
+    if args.query == 'summary':
+        display_summary(index)
+    elif args.query == 'players':
+        display_players(games)
+    else:
+        display_difficulties(games, args.player)
+    print(f"\n{read} logs read, answered in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from Bitmask import CARDS, SUIT_BITS, SUIT_LETTERS, HEARTS_MASK, QS_BIT, card_index, indexes_from_mask
+from Rules import STANDARD, legal_moves
+from Endgame import ENDGAME_TRICKS, TranspositionTable, solve
+from Tracker import deal_unseen
+from multiprocessing import Pool
+import random
+import time
+
+# default per-move budget for the difficulty 4 bot, it stops at whichever limit is reached first
+ITERATIONS = 200
+TIME_BUDGET = 1.0
+
+# node budget for solving the end of the hand exactly in each sample
+ENDGAME_NODES = 2000
+
+# difficulty 4 samples deals of the unseen cards consistent with what has been played,
+# plays each legal card out to the end of the hand with a fast playout policy and picks the card with the lowest average points
+# in the last few tricks each sampled deal is solved exactly instead (see Endgame.py), falling back to playouts if that runs over budget
+# the playouts follow and score the engine's Rules.Variant, the solver is only used when the variant plays the standard game
+
+# work out the position the bot in the given seat can see, as plain values which can be sent to worker processes
+# the unseen cards, how many cards each seat holds and the suits each seat is known to be out of come from the engine's card tracker
+# and the engine's Rules.Variant goes last
+def get_position(engine, seat):
+    tracker = engine.tracker
+    own_hand = engine.players[seat].hand_mask
+    trick = tuple(card_index(card) for card in engine.current_trick)
+    leader = engine.trick_players[0] if engine.trick_players else engine.lead_index
+    taken = tuple(player.trick_mask for player in engine.players)
+
+    return (seat, own_hand, tracker.unseen(seat, own_hand), tuple(tracker.counts), taken, trick, leader, engine.round_num, engine.heart_broken, tuple(tracker.voids), engine.rules)
+
+# deal the unseen cards between the opponents, giving each the number of cards they hold and none of the suits they are out of
+def sample_hands(position, rng):
+    seat, own_hand, unseen, counts = position[:4]
+    return deal_unseen(seat, own_hand, unseen, counts, position[9], rng)
+
+# fast playout policy, similar to difficulty 2 but working on masks, lead_banned is the variant's (see Rules.legal_moves)
+def playout_choice(hand, trick, round_num, heart_broken, lead_banned=HEARTS_MASK):
+    # lead with the lowest valued card available
+    if not trick:
+        moves = legal_moves(hand, round_num, 'DHCS', True, heart_broken, lead_banned)
+        return min(indexes_from_mask(moves), key=lambda index: index % 13)
+
+    lead = trick[0] // 13
+    moves = legal_moves(hand, round_num, SUIT_LETTERS[lead], False)
+    suit_mask = SUIT_BITS << (lead * 13)
+
+    # play the highest card which is lower than the highest card in the trick, else the lowest card of the suit
+    if moves & suit_mask:
+        highest = max(index for index in trick if index // 13 == lead)
+        below = moves & ((1 << highest) - 1)
+        if below:
+            return below.bit_length() - 1
+        return (moves & -moves).bit_length() - 1
+
+    # can't follow suit, get rid of the queen of spades, then the highest heart, then the highest card
+    if moves & QS_BIT:
+        return QS_BIT.bit_length() - 1
+    if moves & HEARTS_MASK:
+        return (moves & HEARTS_MASK).bit_length() - 1
+    return max(indexes_from_mask(moves), key=lambda index: index % 13)
+
+# play the rest of the hand from a position after the first card has been chosen and return the points for every seat
+def play_out(hands, taken, trick, leader, round_num, heart_broken, rules=STANDARD):
+    lead_banned = rules.lead_banned
+    taken = list(taken)
+    trick = list(trick)
+
+    while True:
+        # finish the current trick
+        while len(trick) < 4:
+            seat = (leader + len(trick)) % 4
+            index = playout_choice(hands[seat], trick, round_num, heart_broken, lead_banned)
+            hands[seat] ^= 1 << index
+            trick.append(index)
+            if index >= 39:
+                heart_broken = True
+
+        # give the trick to the highest card of the lead suit
+        lead = trick[0] // 13
+        winning = max(range(4), key=lambda i: trick[i] if trick[i] // 13 == lead else -1)
+        leader = (leader + winning) % 4
+        for index in trick:
+            taken[leader] |= 1 << index
+
+        if round_num == 13:
+            break
+        round_num += 1
+        trick = []
+
+    return rules.hand_scores(taken)
+
+# run samples until the iteration or time budget is used up, returns total points for each candidate and the number of samples
+def run_samples(job):
+    position, candidates, iterations, time_budget, seed = job
+    seat, own_hand, unseen, counts, taken, trick, leader, round_num, heart_broken, voids, rules = position
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_budget
+    totals = [0] * len(candidates)
+    samples = 0
+
+    # solved positions are shared between samples as they often reach the same ends of the hand
+    endgame = 14 - round_num <= ENDGAME_TRICKS and rules.standard_play
+    table = TranspositionTable() if endgame else None
+
+    while samples < iterations and time.perf_counter() < deadline:
+        hands = sample_hands(position, rng)
+
+        if endgame:
+            values = solve(hands, taken, trick, leader, round_num, heart_broken, candidates, table, ENDGAME_NODES, deadline - time.perf_counter(), rules)
+            if values is not None:
+                totals = [a + b for a, b in zip(totals, values)]
+                samples += 1
+                continue
+
+        # use the same deal for every candidate so they are compared fairly
+        for i, index in enumerate(candidates):
+            playout_hands = list(hands)
+            playout_hands[seat] ^= 1 << index
+            totals[i] += play_out(playout_hands, taken, trick + (index,), leader, round_num, heart_broken or index >= 39, rules)[seat]
+
+        samples += 1
+
+    return totals, samples
+
+# get the legal cards for the bot in the given seat and the job for run_samples which scores them
+# the job is made of plain values so it can be sent to another process
+def get_search(engine, seat, iterations=ITERATIONS, time_budget=TIME_BUDGET):
+    position = get_position(engine, seat)
+    candidates = indexes_from_mask(engine.rules.legal_moves(position[1], engine.round_num, engine.lead_suit, engine.first_play, engine.heart_broken if engine.first_play else True))
+    seed = (engine.rng or random).getrandbits(32)
+
+    return candidates, (position, candidates, iterations, time_budget, seed)
+
+# pick the face of the candidate with the lowest total (and so average) points
+def best_choice(candidates, totals):
+    best = min(range(len(candidates)), key=lambda i: totals[i])
+    return CARDS[candidates[best]].face
+
+# choose a card for the bot in the given seat, a multiprocessing pool can be given to spread the samples over workers
+def monte_carlo_choice(engine, seat, iterations=ITERATIONS, time_budget=TIME_BUDGET, pool=None, processes=1):
+    candidates, job = get_search(engine, seat, iterations, time_budget)
+
+    # nothing to decide if only one card can be played
+    if len(candidates) == 1:
+        return CARDS[candidates[0]].face
+
+    if pool is None:
+        totals, samples = run_samples(job)
+    else:
+        # split the iterations between the workers, each with the full time budget
+        position, candidates, iterations, time_budget, seed = job
+        share = -(-iterations // processes)
+        jobs = [(position, candidates, share, time_budget, seed + i) for i in range(processes)]
+        totals = [0] * len(candidates)
+        for worker_totals, _ in pool.map(run_samples, jobs):
+            totals = [a + b for a, b in zip(totals, worker_totals)]
+
+    return best_choice(candidates, totals)
+
+# agent which plays difficulty 4 with its own budget, optionally spreading samples over worker processes
+class MonteCarloAgent():
+    # initialise the budget and create a pool if more than one process is wanted
+    def __init__(self, iterations=ITERATIONS, time_budget=TIME_BUDGET, processes=1):
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.processes = processes
+        self.pool = Pool(processes) if processes > 1 else None
+
+    # choose a card for the given seat
+    def __call__(self, engine, seat):
+        return monte_carlo_choice(engine, seat, self.iterations, self.time_budget, self.pool, self.processes)
+
+    # shut down the worker processes
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
@@ -1,65 +1,98 @@
-from Card import Card
-from math import floor
-
-VAL_CONVERSION = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'Jack', 'Queen', 'King', 'Ace']
+from Bitmask import QS_BIT, FACE_INDEX, CARDS, card_bit, mask_from_cards, display_cards, heart_count
+from Rules import STANDARD, MOON_MASK
 
 # create a player class which will hold hand information and points etc
+# the hand and trick cards are stored as 52-bit masks (see Bitmask.py), hand and trick_hand are read-only lists built from them
 class Player():
     # initialise some important variables
     def __init__(self, name, is_bot):
-        self.hand = []
-        self.trick_hand = []
+        self.hand_mask = 0
+        self.trick_mask = 0
+        self._hand_view = None
+
+        # running penalty totals of the trick cards, kept up to date by add_trick_cards
+        # the points are counted by the Rules.Variant being played, the engine sets it for every player at the table
+        self.rules = STANDARD
+        self.trick_hearts = 0
+        self.trick_queen = False
+        self.trick_points = 0
+
         self.points = 0
         self.name = name
         self.is_bot = is_bot
         self.difficulty = 0
         self.tricks_won = 0
     
+    # list of cards in the hand in display order, rebuilt only after the hand changes
+    @property
+    def hand(self):
+        if self._hand_view is None:
+            self._hand_view = display_cards(self.hand_mask)
+        return self._hand_view
+
+    # list of cards won in tricks
+    @property
+    def trick_hand(self):
+        return display_cards(self.trick_mask)
+
+    # replace the whole hand with a 52-bit mask of cards
+    def set_hand(self, mask):
+        self.hand_mask = mask
+        self._hand_view = None
+
     # add a card to the hand
     def add_card_to_hand(self, card):
-        self.hand.append(card)
+        self.hand_mask |= card_bit(card)
+        self._hand_view = None
     
     # function to remove a card
     def remove_card_from_hand(self, face):
-        # loop through the players cards and return the chosen one whilst removing it from the hand
-        for card in self.hand:
-            if card.face == face:
-                self.hand.remove(card)
-                return card
-        return None
+        # look up the card's bit and return the chosen card whilst removing it from the hand
+        index = FACE_INDEX.get(face)
+        if index is None or not self.hand_mask >> index & 1:
+            return None
+
+        self.hand_mask ^= 1 << index
+        self._hand_view = None
+        return CARDS[index]
     
     # function to add trick cards to list
     def add_trick_cards(self, trick):
-        self.trick_hand += trick
+        self.set_trick_mask(self.trick_mask | mask_from_cards(trick))
+
+    # replace the trick cards with a 52-bit mask and update the penalty totals
+    def set_trick_mask(self, mask):
+        self.trick_mask = mask
+        self.trick_hearts = heart_count(mask)
+        self.trick_queen = bool(mask & QS_BIT)
+        self.trick_points = self.rules.points(mask)
 
     # reset the trick list
     def reset_trick_hand(self):
-        self.trick_hand.clear()
+        self.set_trick_mask(0)
     
     # get trick heart count
     def get_trick_heart_count(self):
-        count = 0
-
-        for card in self.trick_hand:
-            if card.suit == 'hearts':
-                count += 1
-        
-        return count
+        return self.trick_hearts
     
     # check if any of the trick cards is a queen of spades
     def has_queen_spades(self):
-        return any(card.face == 'QS' for card in self.trick_hand)
+        return self.trick_queen
+
+    # get the penalty points taken so far this hand, before any moon is counted
+    def get_trick_points(self):
+        return self.trick_points
     
     # check to see if shot to moon
     def shot_the_moon(self):
-        return self.has_queen_spades() and (self.get_trick_heart_count() >= 13)
+        return self.trick_mask & MOON_MASK == MOON_MASK
     
     # display the users hand
     def display_hand(self):
         print("\nHere is your hand:\n")
 
         for card in self.hand:
-            print(f"{card.face}{' '*(4-len(card.face))}: {VAL_CONVERSION[card.value - 2]} of {card.suit}")
+            print(f"{card.face:<4}: {card.name}")
         
         print('''
 Type --help for a list of commands
@@ -67,7 +100,8 @@ Type --help for a list of commands
     
     # clear the users hand
     def clear_hand(self):
-        self.hand.clear()
+        self.hand_mask = 0
+        self._hand_view = None
     
     # set a bots difficulty
     def set_difficulty(self, difficulty):
@@ -0,0 +1,158 @@
+from Engine import bot_agent
+from Bot import make_choice
+from Player import Player
+from MonteCarlo import ITERATIONS, TIME_BUDGET, get_search, run_samples, best_choice, monte_carlo_choice
+from Bitmask import face_bit
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import random
+
+# pondering, the difficulty 4 bots think while the person at the table is choosing their card
+# when the prompt opens, each card the person could play is played on a copy of the engine and the search of the bot which plays
+# next is started in a process pool, in the order a difficulty 3 bot would rate the cards. once the real card is entered the
+# searches for every other card are cancelled, and when the bot's turn comes it uses the search already made for that card
+#
+# the searches are split into slices, each with its share of the iterations and time budget, so a cancelled search gives its
+# worker back within a slice. the pool has at most processes workers, which caps the CPU pondering can take
+
+# number of the person's plays searched at once, the most likely first
+PONDER_PLAYS = 6
+
+# number of slices each search is split into
+SLICES = 4
+
+# difficulties whose search is worth making ahead of time
+PONDER_DIFFICULTIES = (4,)
+
+# copy of an engine after the player in seat has played face, and the seat which plays next
+# returns None, None if the card ends the hand, the original engine is not changed
+# the copy gets its own random.Random in the same state as the engine's, so pondering never draws from the live game's numbers
+def after_play(engine, seat, face):
+    future = copy.copy(engine)
+    future.rng = random.Random()
+    future.rng.setstate((engine.rng or random).getstate())
+    future.players = [copy.copy(player) for player in engine.players]
+    future.tracker = copy.deepcopy(engine.tracker)
+    future.current_trick = list(engine.current_trick)
+    future.trick_players = list(engine.trick_players)
+    future.listeners = []
+    future.play_turn(seat, face)
+
+    if len(future.current_trick) < 4:
+        return future, (seat + 1) % 4
+
+    future.finish_trick()
+    if future.hand_over():
+        return None, None
+    future.start_trick()
+    return future, future.lead_index
+
+# the person's legal plays, in the order a difficulty 3 bot would choose them
+def likely_plays(engine, seat):
+    player = engine.players[seat]
+    moves = engine.rules.legal_moves(player.hand_mask, engine.round_num, engine.lead_suit, engine.first_play, engine.heart_broken if engine.first_play else True)
+    plays = []
+
+    # ask the bot repeatedly, taking away each card it picks
+    guesser = Player('Guess', True)
+    guesser.set_difficulty(3)
+    while moves:
+        guesser.set_hand(moves)
+        face = make_choice(guesser, engine.round_num, engine.lead_suit, engine.heart_broken, engine.first_play, engine.current_trick, rules=engine.rules)
+        plays.append(face)
+        moves &= ~face_bit(face)
+    return plays
+
+# key of a bot's decision, the hand and the cards played so far decide the position
+def decision_key(engine, seat):
+    return engine.hands_dealt, engine.played_mask, seat
+
+# searches made while the person thinks, and the agents which use them
+# processes caps the workers (and so CPU cores) used, plays is the number of the person's cards searched at once
+class Ponderer():
+    # initialise with an empty cache, the pool is started on the first search
+    def __init__(self, processes=1, plays=PONDER_PLAYS, iterations=ITERATIONS, time_budget=TIME_BUDGET):
+        self.processes = processes
+        self.plays = plays
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.pool = None
+
+        # decision key -> (candidates, futures of the search slices), oldest first
+        self.searches = OrderedDict()
+
+        # number of bot decisions taken from a search made while the person was thinking
+        self.hits = 0
+
+    # start searching each of the person's likely plays, anything still running from earlier is cancelled
+    def start(self, engine, seat):
+        self.cancel()
+        share = -(-self.iterations // SLICES)
+
+        for face in likely_plays(engine, seat)[:self.plays]:
+            future, next_seat = after_play(engine, seat, face)
+            if future is None or not future.players[next_seat].is_bot or future.players[next_seat].difficulty not in PONDER_DIFFICULTIES:
+                continue
+
+            candidates, (position, _, _, time_budget, seed) = get_search(future, next_seat, self.iterations, self.time_budget)
+            if len(candidates) == 1:
+                continue
+
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.processes)
+            jobs = [(position, candidates, share, time_budget / SLICES, seed + i) for i in range(SLICES)]
+            self.searches[decision_key(future, next_seat)] = (candidates, [self.pool.submit(run_samples, job) for job in jobs])
+
+    # keep only the searches which follow from the card the person played
+    def resolve(self, engine, seat, face):
+        future, next_seat = after_play(engine, seat, face)
+        keep = None if future is None else decision_key(future, next_seat)
+        for key in list(self.searches):
+            if key != keep:
+                self.cancel(key)
+
+    # stop searches, every search if no key is given
+    def cancel(self, key=None):
+        for key in ([key] if key is not None else list(self.searches)):
+            _, futures = self.searches.pop(key)
+            for future in futures:
+                future.cancel()
+
+    # agent for the person's seat, wraps the agent which asks them for a card with the start and end of pondering
+    def human_agent(self, agent):
+        def pondering_agent(engine, seat):
+            self.start(engine, seat)
+            try:
+                face = agent(engine, seat)
+            except BaseException:
+                self.cancel()
+                raise
+            self.resolve(engine, seat, face)
+            return face
+        return pondering_agent
+
+    # agent for the bots, uses a search made while the person was thinking if there is one, otherwise the usual bot AI
+    def bot_agent(self, engine, seat):
+        search = self.searches.pop(decision_key(engine, seat), None)
+        if search is None:
+            if engine.players[seat].difficulty == 4:
+                return monte_carlo_choice(engine, seat, self.iterations, self.time_budget)
+            return bot_agent(engine, seat)
+
+        # take the seed the search was made with from the live game too, so the game goes on as if the bot had searched now
+        self.hits += 1
+        (engine.rng or random).getrandbits(32)
+        candidates, futures = search
+        totals = [0] * len(candidates)
+        for future in futures:
+            worker_totals, _ = future.result()
+            totals = [a + b for a, b in zip(totals, worker_totals)]
+        return best_choice(candidates, totals)
+
+    # cancel everything and shut down the workers
+    def close(self):
+        self.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
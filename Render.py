@@ -0,0 +1,184 @@
+from Engine import GameListener
+import sys
+import time
+
+# terminal rendering with ANSI escape codes, the screen is kept as a list of lines and only the lines which change are redrawn
+# this replaces os.system("clear") which started a new process every time the screen was cleared
+
+CLEAR_SCREEN = '\x1b[2J\x1b[H'
+CLEAR_LINE = '\x1b[2K'
+CLEAR_BELOW = '\x1b[J'
+
+# clear the terminal without starting a shell
+def clear(stream=None):
+    stream = stream or sys.stdout
+    stream.write(CLEAR_SCREEN)
+    stream.flush()
+
+# move the cursor to a row (0 is the top) at the start of the line
+def move_to(row):
+    return f'\x1b[{row + 1};1H'
+
+# how long to pause after each card, trick and hand, and how often the screen can be redrawn
+# frame_interval limits redraws when there are no pauses so drawing doesn't slow the game down, the end of each hand is always drawn
+class Pacing():
+    def __init__(self, card=0.0, trick=0.0, hand=0.0, frame_interval=0.0):
+        self.card = card
+        self.trick = trick
+        self.hand = hand
+        self.frame_interval = frame_interval
+
+# named pacings, normal is the speed of a game against the bots, watch shows a few hundred hands a minute and turbo has no pauses
+PACINGS = {
+    'normal': Pacing(card=0.5),
+    'watch': Pacing(card=0.002, trick=0.005, hand=0.05),
+    'turbo': Pacing(frame_interval=1 / 30),
+}
+
+# a screen of lines which redraws only the lines that have changed since the last draw
+class Screen():
+    # initialise with nothing drawn, stream defaults to stdout
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lines = []
+        self.full = True
+
+    # redraw everything next time, used after something else has printed to the terminal
+    def invalidate(self):
+        self.full = True
+
+    # draw the lines, leaving the cursor on the line below them
+    def draw(self, lines):
+        if self.full:
+            out = [CLEAR_SCREEN]
+            old = []
+        else:
+            out = []
+            old = self.lines
+
+        for row, line in enumerate(lines):
+            if row >= len(old) or old[row] != line:
+                out.append(f'{move_to(row)}{CLEAR_LINE}{line}')
+
+        # anything below the lines (e.g. old prompts and messages) is cleared
+        out.append(f'{move_to(len(lines))}{CLEAR_BELOW}')
+
+        self.stream.write(''.join(out))
+        self.stream.flush()
+        self.lines = list(lines)
+        self.full = False
+
+# list the faces in a hand by suit, spades and hearts first as in display_hand
+def hand_lines(player):
+    hand = player.hand
+    lines = []
+    for suit in ('spades', 'hearts', 'diamonds', 'clubs'):
+        faces = [card.face for card in hand if card.suit == suit]
+        lines.append(f"  {suit.capitalize():<9}: {' '.join(faces)}")
+    return lines
+
+# listener which draws the table as a fixed layout: scores, the trick, a message and the hands
+# seat is the player whose hand is shown, or None to show every hand (for watching bots)
+# wait is True to ask for Enter after each trick and hand, as in a game against the bots
+class TableView(GameListener):
+    # initialise the view
+    def __init__(self, pacing=None, screen=None, seat=0, wait=True):
+        self.pacing = pacing or PACINGS['normal']
+        self.screen = screen or Screen()
+        self.seat = seat
+        self.wait = wait
+        self.hands = 0
+        self.games = 0
+        self.message = ''
+        self.passed = ''
+        self.last_draw = 0.0
+
+    # build the lines of the screen from the engine's state
+    def layout(self, engine):
+        players = engine.players
+        lines = [
+            f"Hearts - {f'game {self.games} ' if self.games else ''}hand {self.hands}, round {min(engine.round_num, 13)}, hearts broken: {'yes' if engine.heart_broken else 'no'}",
+            '   '.join(f'{player.name} {player.points} (+{player.get_trick_points()})' for player in players),
+            '',
+        ]
+
+        # one line for each card in the trick, blank lines keep the layout fixed
+        for i in range(4):
+            if i < len(engine.current_trick):
+                name = players[engine.trick_players[i]].name
+                lines.append(f"{name}{' '*(6-len(name))}: {engine.current_trick[i].name}")
+            else:
+                lines.append('')
+
+        lines += ['', self.message, '']
+
+        if self.seat is None:
+            for player in players:
+                lines.append(f'{player.name}:')
+                lines += hand_lines(player)
+        else:
+            lines.append('Your hand:')
+            lines += hand_lines(players[self.seat])
+            lines += ['', 'Type --help for a list of commands']
+
+        return lines
+
+    # draw the screen, skipping the draw if the last one was too recent unless force is True
+    def render(self, engine, force=False):
+        interval = self.pacing.frame_interval
+        if interval and not force:
+            now = time.perf_counter()
+            if now - self.last_draw < interval:
+                return
+            self.last_draw = now
+        self.screen.draw(self.layout(engine))
+
+    # pause for a number of seconds, no pause is made for 0
+    def pause(self, seconds):
+        if seconds:
+            time.sleep(seconds)
+
+    # remember the cards passed to and from the player, to show with the new hand
+    def on_pass(self, engine, offset, passed):
+        if self.seat is not None:
+            given = ' '.join(card.face for card in passed[self.seat])
+            received = ' '.join(card.face for card in passed[(self.seat - offset) % 4])
+            self.passed = f'You passed {given} and received {received}.'
+
+    # new hand, count it and replace the last message with any passed cards
+    def on_deal(self, engine):
+        self.hands += 1
+        self.message = self.passed
+        self.passed = ''
+        self.render(engine)
+
+    # draw before each turn so the player can see their hand before choosing
+    def on_turn(self, engine, seat):
+        if engine.first_play:
+            self.message = ''
+        self.render(engine, force=self.wait and seat == self.seat)
+
+    # draw the card played and wait a moment
+    def on_play(self, engine, seat, card):
+        self.render(engine)
+        self.pause(self.pacing.card)
+
+    # show who won the trick
+    def on_trick(self, engine, seat):
+        self.message = f'{engine.players[seat].name} won this trick.'
+        if self.wait:
+            self.message += ' (Enter to continue)'
+            self.render(engine, force=True)
+            input()
+        else:
+            self.render(engine)
+            self.pause(self.pacing.trick)
+
+    # show the scores at the end of the hand
+    def on_hand_end(self, engine):
+        self.message = 'End of hand, press Enter to continue.' if self.wait else 'End of hand.'
+        self.render(engine, force=True)
+        if self.wait:
+            input()
+        else:
+            self.pause(self.pacing.hand)
@@ -0,0 +1,163 @@
+from Bitmask import HEARTS_MASK, QS_BIT, SUIT_MASKS, FACE_INDEX, indexes_from_mask, popcount
+from Card import VALID_VALS, SUIT_LETTERS
+
+# every rule of the game is looked up here, the engine, bots, server and terminal UI all ask a Variant rather than
+# checking cards themselves. a Variant builds its tables once, so checking a play or scoring a hand is a few mask
+# operations and list lookups
+
+# points which end a game
+POINT_LIMIT = 50
+
+# cards which cannot be played on round 1
+ROUND_1_BANNED = HEARTS_MASK | QS_BIT
+
+# a player has shot the moon if they take all of these
+MOON_MASK = HEARTS_MASK | QS_BIT
+
+# number of seats along from the passer the passed cards go to, for each passing direction
+PASS_OFFSETS = {'hold': 0, 'left': 1, 'across': 2, 'right': 3}
+
+# the usual passing cycle, one direction for each hand
+PASS_CYCLE = ('left', 'right', 'across', 'hold')
+
+# number of cards each player passes
+PASS_COUNT = 3
+
+JD_INDEX = FACE_INDEX['JD']
+QS_INDEX = FACE_INDEX['QS']
+
+# generate every legal play from a hand in one pass, hand and the returned value are 52-bit masks (see Bitmask.py)
+# lead_suit is a suit letter, or 'DHCS' when leading the trick
+# heart_broken is only used when leading, to prevent hearts being led too early
+# lead_banned is the mask of cards that can't be led before hearts are broken, Variant.legal_moves fills it in
+def legal_moves(hand, round, lead_suit, first_play, heart_broken=True, lead_banned=HEARTS_MASK):
+    moves = hand
+
+    # a card matching the lead suit must be played if one is available
+    following = hand & SUIT_MASKS.get(lead_suit, 0)
+    if following:
+        moves = following
+
+    # no hearts or the queen of spades can be played on round 1, unless there is nothing else
+    if round == 1 and moves & ~ROUND_1_BANNED:
+        moves &= ~ROUND_1_BANNED
+
+    # hearts cannot be led before they have been broken, unless only hearts are left in hand
+    if first_play and not heart_broken and moves & ~lead_banned:
+        moves &= ~lead_banned
+
+    return moves
+
+# position in a trick of the highest card of the lead suit, trick is a list of card indexes
+def trick_winner(trick):
+    lead = trick[0] // 13
+    best = 0
+    for i in range(1, len(trick)):
+        if trick[i] // 13 == lead and trick[i] > trick[best]:
+            best = i
+    return best
+
+# a set of house rules, each option changes one of the tables the rest of the game looks up
+# point_limit ends the game, passing is the cycle of directions cards are passed in before each hand (empty for no passing),
+# jack_diamonds makes the jack of diamonds worth -10 points and hearts_lead lets hearts be led before they are broken
+class Variant():
+    # check the options and build the tables
+    def __init__(self, point_limit=POINT_LIMIT, passing=(), jack_diamonds=False, hearts_lead=False):
+        for direction in passing:
+            if direction not in PASS_OFFSETS:
+                raise ValueError(f"unknown passing direction {direction!r}, use {', '.join(PASS_OFFSETS)}")
+
+        self.point_limit = point_limit
+        self.passing = tuple(passing)
+        self.jack_diamonds = jack_diamonds
+        self.hearts_lead = hearts_lead
+
+        # seats along the cards are passed to on each hand of the cycle
+        self.pass_offsets = [PASS_OFFSETS[direction] for direction in self.passing]
+
+        # cards which can't be led before hearts are broken
+        self.lead_banned = 0 if hearts_lead else HEARTS_MASK
+
+        # points of every card by index
+        self.card_points = [0] * 52
+        for index in indexes_from_mask(HEARTS_MASK):
+            self.card_points[index] = 1
+        self.card_points[QS_INDEX] = 13
+        if jack_diamonds:
+            self.card_points[JD_INDEX] = -10
+
+        # hearts are all worth 1 so they are counted together, the bit and points of every other card worth anything
+        self.other_points = [(1 << index, points) for index, points in enumerate(self.card_points) if points and not HEARTS_MASK >> index & 1]
+
+        # True if cards are played and scored as in the standard game, only the point limit and passing differ
+        # the endgame solver and the batch simulator have the standard rules built in and check this
+        self.standard_play = not jack_diamonds and not hearts_lead
+
+    # mask of the legal plays from a hand, see legal_moves
+    def legal_moves(self, hand, round, lead_suit, first_play, heart_broken=True):
+        return legal_moves(hand, round, lead_suit, first_play, heart_broken, self.lead_banned)
+
+    # the reason a card face can't be played, or None if it can
+    def play_error(self, face, hand, round, lead_suit, first_play, heart_broken=True):
+        # choice should only be 2 or 3 characters characters, a value and a suit letter
+        if len(face) < 2 or len(face) > 3:
+            return "Choice should consist of 2 or 3 characters, a value and suit letter"
+        if face[:-1] not in VALID_VALS:
+            return f"{face[:-1]} is not a valid value. Values are: 1, 2, 3...J, Q, K, A."
+        if face[-1] not in SUIT_LETTERS:
+            return f"{face[-1]} is not a valid suit. Suits are: D, S, C, H"
+
+        bit = 1 << FACE_INDEX[face]
+        if not hand & bit:
+            return "You do not have that card."
+
+        # check the card is in the legal set, then work out which rule it breaks
+        if bit & self.legal_moves(hand, round, lead_suit, first_play, heart_broken):
+            return None
+        if round == 1 and bit & ROUND_1_BANNED:
+            return "No hearts or the queen of spades cannot be played on round 1."
+        if not first_play and face[-1] != lead_suit:
+            return "One or more cards that follow suit are available, you must play a card which follows suit."
+        return "Cannot lead with a heart before hearts have been broken."
+
+    # points of a mask of cards, before any moon is counted
+    def points(self, mask):
+        total = popcount(mask & HEARTS_MASK)
+        for bit, points in self.other_points:
+            if mask & bit:
+                total += points
+        return total
+
+    # points each seat scores for a hand from the masks of the trick cards they took
+    # if someone shot the moon everyone else gets 26 points instead of the moon cards, other cards still count as normal
+    def hand_scores(self, masks):
+        shooter = next((seat for seat, mask in enumerate(masks) if mask & MOON_MASK == MOON_MASK), None)
+        if shooter is None:
+            return [self.points(mask) for mask in masks]
+        return [self.points(mask & ~MOON_MASK) + (0 if seat == shooter else 26) for seat, mask in enumerate(masks)]
+
+    # number of seats along the cards are passed to before a hand, hands are counted from 0 and 0 means no passing
+    def pass_offset(self, hand_number):
+        if not self.pass_offsets:
+            return 0
+        return self.pass_offsets[hand_number % len(self.pass_offsets)]
+
+    # name of the passing direction before a hand
+    def pass_direction(self, hand_number):
+        return self.passing[hand_number % len(self.passing)] if self.passing else 'hold'
+
+    # short description of the options which differ from the standard game
+    def describe(self):
+        options = []
+        if self.point_limit != POINT_LIMIT:
+            options.append(f'{self.point_limit} points')
+        if self.passing:
+            options.append('passing ' + '/'.join(self.passing))
+        if self.jack_diamonds:
+            options.append('jack of diamonds -10')
+        if self.hearts_lead:
+            options.append('hearts may be led')
+        return ', '.join(options) or 'standard rules'
+
+# the standard game this repo has always played, first to 50 points with no passing
+STANDARD = Variant()
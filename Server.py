@@ -0,0 +1,331 @@
+from Engine import GameEngine, GameListener, bot_agent, get_winners
+from Player import Player
+from Bot import is_valid_choice
+from Bitmask import display_cards
+from MonteCarlo import get_search, run_samples, best_choice
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import traceback
+
+# asyncio server hosting many tables at once, every seat can be a person connected over TCP or a bot
+#
+# the protocol is one line of text per message, words separated by spaces
+#
+# client -> server
+#   JOIN <table> <name>     sit at the next free seat of a table, the table is created if it doesn't exist
+#   START [difficulty]      fill the empty seats with bots of the difficulty (default 2) and start the game
+#   PLAY <face>             play a card when asked, e.g. PLAY QS, a card sent at any other time is refused
+#   TABLES                  list the tables
+#   QUIT                    leave, a bot takes over the seat if a game is running
+#
+# server -> client
+#   SEATED <table> <seat>               you have joined a table
+#   JOINED <seat> <name>                someone sat at your table
+#   STARTED <name> <name> <name> <name> the game has started, names are in seat order
+#   DEAL <faces...>                     your new hand
+#   HAND <faces...>                     your hand before each of your turns
+#   TURN <round> <lead suit or -> <hearts broken 0/1> <legal faces...>    your turn, reply with PLAY
+#   PLAYED <seat> <face>                a card was played
+#   TRICK <seat>                        who won the trick
+#   SCORES <points...>                  everyone's points after a hand, in seat order
+#   GAMEOVER <seats...>                 the game has finished, the winning seats are given
+#   TABLES <table>:<players>:<started> ...
+#   ERROR <message>
+
+DEFAULT_PORT = 7777
+
+# difficulty of the bot which takes over a seat when a person leaves
+REPLACEMENT_DIFFICULTY = 2
+
+# a seat at a table, writer is None for a bot
+class Seat():
+    # initialise the seat, people get a queue which their PLAY messages are put in
+    def __init__(self, name, writer=None):
+        self.name = name
+        self.writer = writer
+        self.choices = asyncio.Queue() if writer is not None else None
+
+    # send a line to the person in the seat, bots and closed connections are ignored
+    def send(self, line):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(f'{line}\n'.encode())
+
+    # wait until everything sent has been written to the connection
+    async def flush(self):
+        if self.writer is not None and not self.writer.is_closing():
+            try:
+                await self.writer.drain()
+            except ConnectionError:
+                pass
+
+# listener which sends the game's events to everyone at the table
+class TableListener(GameListener):
+    # initialise with the table to send to
+    def __init__(self, table):
+        self.table = table
+
+    # send each person their hand
+    def on_deal(self, engine):
+        for seat, player in zip(self.table.seats, engine.players):
+            seat.send('DEAL ' + ' '.join(card.face for card in player.hand))
+
+    # tell everyone the card played
+    def on_play(self, engine, seat, card):
+        self.table.broadcast(f'PLAYED {seat} {card.face}')
+
+    # tell everyone who won the trick
+    def on_trick(self, engine, seat):
+        self.table.broadcast(f'TRICK {seat}')
+
+    # tell everyone the scores
+    def on_hand_end(self, engine):
+        self.table.broadcast('SCORES ' + ' '.join(str(player.points) for player in engine.players))
+
+# a table of 4 seats playing one game
+class Table():
+    # initialise an empty table
+    def __init__(self, table_id, server):
+        self.table_id = table_id
+        self.server = server
+        self.seats = [None, None, None, None]
+        self.engine = None
+        self.task = None
+
+        # index of the seat asked for a card which hasn't answered yet, None when no one is being asked
+        self.waiting = None
+
+    # send a line to everyone at the table
+    def broadcast(self, line):
+        for seat in self.seats:
+            if seat is not None:
+                seat.send(line)
+
+    # sit a person at the next free seat, returns the seat index or None if the table is full or playing
+    def join(self, name, writer):
+        if self.task is not None or None not in self.seats:
+            return None
+
+        index = self.seats.index(None)
+        self.seats[index] = Seat(name, writer)
+        return index
+
+    # remove a person from the table, a bot takes over if the game has started
+    def leave(self, index):
+        seat = self.seats[index]
+        if self.engine is None:
+            self.seats[index] = None
+            if self.task is None and self.seats == [None, None, None, None]:
+                self.server.tables.pop(self.table_id, None)
+            return
+
+        player = self.engine.players[index]
+        player.is_bot = True
+        player.set_difficulty(REPLACEMENT_DIFFICULTY)
+        seat.writer = None
+
+        # wake up the game if it was waiting for this person
+        seat.choices.put_nowait(None)
+
+    # pass the card sent by the person in a seat to the game, returns False if they haven't been asked for one
+    def play(self, index, face):
+        if self.waiting != index:
+            return False
+
+        self.waiting = None
+        self.seats[index].choices.put_nowait(face)
+        return True
+
+    # start the game in the background
+    def start(self, difficulty):
+        self.task = asyncio.create_task(self.run(difficulty))
+        self.task.add_done_callback(self.finished)
+
+    # report a game which stopped with an error, to the server's output and to everyone still at the table
+    def finished(self, task):
+        if task.cancelled() or task.exception() is None:
+            return
+
+        error = task.exception()
+        print(f'Table {self.table_id} stopped with an error:')
+        traceback.print_exception(type(error), error, error.__traceback__)
+        self.broadcast(f'ERROR the game stopped: {error}')
+
+    # fill the empty seats with bots and play a full game
+    async def run(self, difficulty):
+        for index in range(4):
+            if self.seats[index] is None:
+                self.seats[index] = Seat(f'Bot{index+1}')
+
+        players = [Player(seat.name, seat.writer is None) for seat in self.seats]
+        for player in players:
+            player.set_difficulty(difficulty)
+
+        self.engine = engine = GameEngine(players, listeners=[TableListener(self)])
+        self.broadcast('STARTED ' + ' '.join(seat.name for seat in self.seats))
+
+        try:
+            while not engine.game_over():
+                engine.deal()
+                while not engine.hand_over():
+                    for seat in engine.start_trick():
+                        chosen = None if engine.is_automatic_play() else await self.get_choice(seat)
+                        engine.play_turn(seat, chosen)
+
+                        # let other tables run between moves
+                        await asyncio.sleep(0)
+                    engine.finish_trick()
+                engine.score_hand()
+
+            winners = get_winners(players)
+            self.broadcast('GAMEOVER ' + ' '.join(str(players.index(player)) for player in winners))
+            for seat in self.seats:
+                await seat.flush()
+        finally:
+            self.server.tables.pop(self.table_id, None)
+
+    # get the card the player in a seat wants to play
+    async def get_choice(self, index):
+        engine = self.engine
+        player = engine.players[index]
+        seat = self.seats[index]
+
+        # people are asked over the connection until they send a valid card
+        while not player.is_bot:
+            legal = engine.rules.legal_moves(player.hand_mask, engine.round_num, engine.lead_suit, engine.first_play, engine.heart_broken)
+            seat.send('HAND ' + ' '.join(card.face for card in player.hand))
+            seat.send(f"TURN {engine.round_num} {'-' if engine.first_play else engine.lead_suit} {int(engine.heart_broken)} " + ' '.join(card.face for card in display_cards(legal)))
+            await seat.flush()
+
+            self.waiting = index
+            chosen = await seat.choices.get()
+            self.waiting = None
+            if chosen is not None and is_valid_choice(chosen, player, engine.round_num, engine.lead_suit, engine.first_play, engine.heart_broken, engine.rules):
+                return chosen
+            if chosen is not None:
+                seat.send(f'ERROR {chosen} cannot be played')
+
+        # the monte carlo bot is slow so its samples are run in the process pool to keep the server responsive
+        if player.difficulty == 4:
+            candidates, job = get_search(engine, index)
+            if len(candidates) == 1:
+                return best_choice(candidates, [0])
+            totals, _ = await asyncio.get_running_loop().run_in_executor(self.server.pool, run_samples, job)
+            return best_choice(candidates, totals)
+
+        return bot_agent(engine, index)
+
+# server which accepts connections and runs the tables
+class HeartsServer():
+    # initialise the server, processes is the size of the pool used by difficulty 4 bots
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, processes=None):
+        self.host = host
+        self.port = port
+        self.tables = {}
+        self.pool = ProcessPoolExecutor(processes)
+        self.server = None
+
+    # start listening, returns the port in use (useful when port 0 is given to pick a free one)
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    # keep serving until cancelled
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    # stop listening, cancel the running tables and shut down the pool
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for table in list(self.tables.values()):
+            if table.task is not None:
+                table.task.cancel()
+        self.pool.shutdown(cancel_futures=True)
+
+    # handle the messages from one connection until it closes
+    async def handle_connection(self, reader, writer):
+        table = None
+        index = None
+
+        # send a single line straight to this connection
+        def reply(line):
+            writer.write(f'{line}\n'.encode())
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                words = line.decode().split()
+                if not words:
+                    continue
+                command = words[0].upper()
+
+                if command == 'JOIN' and len(words) >= 3 and table is None:
+                    table = self.tables.setdefault(words[1], Table(words[1], self))
+                    index = table.join('_'.join(words[2:]), writer)
+                    if index is None:
+                        table = None
+                        reply('ERROR table is full or already playing')
+                    else:
+                        reply(f'SEATED {words[1]} {index}')
+                        table.broadcast(f'JOINED {index} {table.seats[index].name}')
+
+                elif command == 'START' and table is not None and table.task is None:
+                    difficulty = int(words[1]) if len(words) > 1 and words[1].isdigit() else REPLACEMENT_DIFFICULTY
+                    if difficulty not in range(6):
+                        reply('ERROR difficulty must be between 0 and 5')
+                    else:
+                        table.start(difficulty)
+
+                elif command == 'PLAY' and len(words) == 2 and table is not None:
+                    if not table.play(index, words[1].upper()):
+                        reply('ERROR it is not your turn')
+
+                elif command == 'TABLES':
+                    reply('TABLES ' + ' '.join(f'{t.table_id}:{sum(s is not None and s.writer is not None for s in t.seats)}:{int(t.task is not None)}' for t in self.tables.values()))
+
+                elif command == 'QUIT':
+                    break
+
+                else:
+                    reply(f'ERROR unknown or unexpected command {command}')
+
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+            if table is not None:
+                table.leave(index)
+            writer.close()
+
+# read the command line options and run the server
+def main():
+    parser = argparse.ArgumentParser(description='Host hearts tables over TCP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+    parser.add_argument('--processes', type=int, default=None, help='size of the process pool used by difficulty 4 bots')
+    args = parser.parse_args()
+
+    async def serve():
+        server = HeartsServer(args.host, args.port, args.processes)
+        port = await server.start()
+        print(f'Serving hearts on {args.host}:{port}')
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from Rules import POINT_LIMIT
+from Tournament import play_game, game_seed
+from multiprocessing import Pool
+from collections import deque
+import argparse
+import csv
+import os
+import time
+
+# streaming simulation, simulate_games yields one small tuple of ints per game and keeps nothing once it has been yielded,
+# so memory use is the same for a thousand games or a hundred million. every game is played by the normal GameEngine
+# (Player, deal_deck, calculate_game_scores) with its own seed from game_seed, so game i always plays out the same way
+# and a run can be carried on from any game number after a crash
+#
+# a record holds the game number, the hands played and then for each seat in turn its points, tricks won, moons shot,
+# queen of spades captures and 1 if it won (drawn games have more than one winner), see FIELDS
+
+FIELDS = ('game', 'hands') + tuple(f'{name}_{seat}' for name in ('points', 'tricks', 'moons', 'queens', 'win') for seat in range(4))
+
+# number of games each worker plays in one job, and the number of jobs waiting for each worker at once
+CHUNK_SIZE = 250
+JOBS_PER_PROCESS = 2
+
+# bytes read from the end of a CSV file to find its last line, far more than a record takes
+TAIL_SIZE = 4096
+
+# play one game and build its record
+def game_record(seats, seed, index, point_limit):
+    players, winners, stats = play_game(seats, game_seed(seed, index), point_limit)
+    return ((index, stats.hands) + tuple(player.points for player in players) + tuple(stats.tricks) + tuple(stats.moons)
+            + tuple(stats.queens) + tuple(int(player in winners) for player in players))
+
+# play a range of games and return their records, this is run in the worker processes
+def play_records(job):
+    seats, seed, start, stop, point_limit = job
+    return [game_record(seats, seed, index, point_limit) for index in range(start, stop)]
+
+# yield the record of every game from start up to n, in order
+# with more than one process the games are played in chunks across a pool, with only a few chunks waiting at once
+def simulate_games(n, seats, seed=0, start=0, processes=1, point_limit=POINT_LIMIT):
+    if processes <= 1:
+        for index in range(start, n):
+            yield game_record(seats, seed, index, point_limit)
+        return
+
+    jobs = ((seats, seed, first, min(first + CHUNK_SIZE, n), point_limit) for first in range(start, n, CHUNK_SIZE))
+    with Pool(processes) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.apply_async(play_records, (job,)))
+            if len(pending) >= processes * JOBS_PER_PROCESS:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+# group records into lists of up to size, e.g. for pandas.DataFrame.from_records(chunk, columns=FIELDS)
+def chunks(records, size=10000):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# number of the game after the last one in a CSV file of records, the game to carry on from, 0 if there is no file
+# only the end of the file is read, and a last line cut off by a crash is ignored
+def resume_offset(path):
+    if not os.path.exists(path):
+        return 0
+
+    # the last complete line is the one before the final newline
+    _, tail = read_tail(path)
+    for line in reversed(tail.split(b'\n')[:-1]):
+        game = line.split(b',', 1)[0]
+        if game.isdigit():
+            return int(game) + 1
+    return 0
+
+# write records to a CSV file a chunk at a time, adding to the file if it already has records
+# the file is flushed after every chunk so a crash loses at most one chunk
+def write_csv(records, path, chunk_size=10000):
+    new = not os.path.exists(path) or os.path.getsize(path) == 0
+    count = 0
+
+    with open(path, 'a', newline='') as f:
+        # drop a line cut off by a crash so the next record starts on its own line
+        if not new:
+            size, tail = read_tail(path)
+            if not tail.endswith(b'\n'):
+                f.truncate(size - len(tail) + tail.rfind(b'\n') + 1)
+
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(FIELDS)
+        for chunk in chunks(records, chunk_size):
+            writer.writerows(chunk)
+            f.flush()
+            count += len(chunk)
+
+    return count
+
+# size of a file and its last TAIL_SIZE bytes
+def read_tail(path):
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - TAIL_SIZE))
+        return size, f.read()
+
+# read the command line options and stream the records to a CSV file, carrying on from the end of the file if it exists
+def main():
+    parser = argparse.ArgumentParser(description='Play bot games and stream one result record per game to a CSV file.')
+    parser.add_argument('--games', type=int, default=1000, help='total number of games the file should hold')
+    parser.add_argument('--seats', default='0,1,2,3', help='difficulty of the bot in each seat, e.g. 3,3,2,1')
+    parser.add_argument('--seed', type=int, default=0, help='seed used to make the deals reproducible')
+    parser.add_argument('--out', default='results.csv', help='CSV file to write, an existing file is carried on from its last game')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--point-limit', type=int, default=POINT_LIMIT, help='points which end a game')
+    args = parser.parse_args()
+
+    seats = [int(difficulty) for difficulty in args.seats.split(',')]
+    if len(seats) != 4 or any(difficulty not in range(6) for difficulty in seats):
+        parser.error('--seats needs 4 difficulties between 0 and 5')
+
+    start_game = resume_offset(args.out)
+    if start_game:
+        print(f'Carrying on from game {start_game}')
+
+    start = time.perf_counter()
+    count = write_csv(simulate_games(args.games, seats, args.seed, start_game, args.processes, args.point_limit), args.out)
+    elapsed = time.perf_counter() - start
+    print(f'Wrote {count} games to {args.out} in {elapsed:.2f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+from Bitmask import SUIT_LETTERS, TWO_CLUBS_BIT, FULL_MASK
+from Rules import STANDARD
+
+# everything needed to carry on a hand from any point, held as a few ints and lists of ints rather than Player and Card objects
+# search and rollout code plays moves with apply and takes them back with undo, which only change the ints a move touches,
+# and clone copies the state for another search in a handful of list copies
+#
+# seats are numbered 0-3 in play order and cards by their index (see Bitmask.py), hands and won tricks are 52-bit masks
+# the state plays and scores by its Rules.Variant, the standard game by default
+class GameState():
+    __slots__ = ('hands', 'won', 'taken', 'tricks_won', 'points', 'trick', 'leader', 'round_num', 'heart_broken', 'played', 'history', 'rules')
+
+    # initialise from the hand masks, the rest defaults to the start of a hand
+    # won is each seat's mask of trick cards, points the game scores before this hand and trick the cards played to the current trick
+    def __init__(self, hands, won=(0, 0, 0, 0), tricks_won=(0, 0, 0, 0), points=(0, 0, 0, 0), trick=(), leader=None, round_num=1, heart_broken=False,
+                 rules=STANDARD):
+        self.rules = rules
+        self.hands = list(hands)
+        self.won = list(won)
+        self.taken = [trick_points(mask, rules) for mask in won]
+        self.tricks_won = list(tricks_won)
+        self.points = list(points)
+        self.trick = list(trick)
+        self.round_num = round_num
+        self.heart_broken = heart_broken
+
+        # the player with the 2 of clubs leads the first trick
+        if leader is None:
+            leader = next((seat for seat in range(4) if self.hands[seat] & TWO_CLUBS_BIT), 0)
+        self.leader = leader
+
+        self.played = FULL_MASK
+        for hand in self.hands:
+            self.played &= ~hand
+
+        # undo records of the moves applied, newest last
+        self.history = []
+
+    # create a state from a list of 4 players, with the leader and cards of the current trick
+    @classmethod
+    def from_players(cls, players, leader=None, round_num=1, heart_broken=False, trick=(), rules=STANDARD):
+        return cls([player.hand_mask for player in players], [player.trick_mask for player in players], [player.tricks_won for player in players],
+                   [player.points for player in players], trick, leader, round_num, heart_broken, rules)
+
+    # create a state from a GameEngine part way through a hand
+    # the engine keeps a full trick until the next one starts, it may not have been given to its winner yet (e.g. in on_play),
+    # it may already be in the winner's trick mask (from on_trick on) or be left over from the last hand (in on_deal)
+    @classmethod
+    def from_engine(cls, engine):
+        players = engine.players
+        trick = [card.index for card in engine.current_trick]
+        leader = engine.trick_players[0] if engine.trick_players else engine.lead_index
+        if len(trick) < 4:
+            return cls.from_players(players, leader, engine.round_num, engine.heart_broken, trick, engine.rules)
+
+        mask = (1 << trick[0]) | (1 << trick[1]) | (1 << trick[2]) | (1 << trick[3])
+        if engine.round_num > 13 or any(player.hand_mask & mask for player in players):
+            return cls.from_players(players, engine.lead_index, engine.round_num, engine.heart_broken, (), engine.rules)
+
+        # the winner may have the trick before the engine has moved the lead and round on, so they are worked out from the tricks won
+        winner = next((seat for seat, player in enumerate(players) if player.trick_mask & mask), None)
+        if winner is not None:
+            return cls.from_players(players, winner, sum(player.tricks_won for player in players) + 1, engine.heart_broken, (), engine.rules)
+
+        # otherwise put the last card back in its player's hand and play it, which gives the trick to its winner
+        state = cls.from_players(players, leader, engine.round_num, engine.heart_broken, trick[:3], engine.rules)
+        state.hands[(leader + 3) % 4] |= 1 << trick[3]
+        state.played &= ~(1 << trick[3])
+        state.apply(trick[3])
+        state.history = []
+        return state
+
+    # copy the hands, trick cards and scores back into a list of 4 players
+    def to_players(self, players):
+        for seat, player in enumerate(players):
+            player.set_hand(self.hands[seat])
+            player.set_trick_mask(self.won[seat])
+            player.tricks_won = self.tricks_won[seat]
+            player.points = self.points[seat]
+
+    # copy of the state without its undo history
+    def clone(self):
+        state = GameState.__new__(GameState)
+        state.hands = self.hands[:]
+        state.won = self.won[:]
+        state.taken = self.taken[:]
+        state.tricks_won = self.tricks_won[:]
+        state.points = self.points[:]
+        state.trick = self.trick[:]
+        state.leader = self.leader
+        state.round_num = self.round_num
+        state.heart_broken = self.heart_broken
+        state.played = self.played
+        state.history = []
+        state.rules = self.rules
+        return state
+
+    # hashable snapshot of the state, two states with the same key play out the same way
+    def key(self):
+        return (tuple(self.hands), tuple(self.taken), tuple(self.points), tuple(self.trick), self.leader, self.heart_broken)
+
+    # seat of the player to play next
+    @property
+    def turn(self):
+        return (self.leader + len(self.trick)) % 4
+
+    # suit letter of the current trick, or 'DHCS' when the next card leads (as used by Rules.legal_moves)
+    @property
+    def lead_suit(self):
+        return SUIT_LETTERS[self.trick[0] // 13] if self.trick else 'DHCS'
+
+    # mask of the cards the player to play next can play, the first trick must be led with the 2 of clubs
+    def legal_moves(self):
+        hand = self.hands[self.turn]
+        first_play = not self.trick
+        if first_play and self.round_num == 1 and hand & TWO_CLUBS_BIT:
+            return TWO_CLUBS_BIT
+        return self.rules.legal_moves(hand, self.round_num, self.lead_suit, first_play, self.heart_broken if first_play else True)
+
+    # check if every card of the hand has been played
+    def hand_over(self):
+        return self.round_num > 13
+
+    # points each seat scores for the hand, counting a shot moon as 26 for everyone else
+    def hand_scores(self):
+        return self.rules.hand_scores(self.won)
+
+    # play a card index for the player to play next, the card isn't checked so it must come from legal_moves
+    # returns the seat which won the trick if the card finished it, otherwise None
+    def apply(self, card):
+        seat = (self.leader + len(self.trick)) % 4
+        bit = 1 << card
+        self.hands[seat] ^= bit
+        self.played |= bit
+        self.trick.append(card)
+        self.history.append((card, self.heart_broken, None))
+        if card >= 39:
+            self.heart_broken = True
+
+        if len(self.trick) < 4:
+            return None
+
+        # the highest card of the lead suit wins the trick
+        trick = self.trick
+        lead = trick[0] // 13
+        best = 0
+        for i in range(1, 4):
+            if trick[i] // 13 == lead and trick[i] > trick[best]:
+                best = i
+        winner = (self.leader + best) % 4
+
+        mask = (1 << trick[0]) | (1 << trick[1]) | (1 << trick[2]) | bit
+        self.won[winner] |= mask
+        self.taken[winner] += trick_points(mask, self.rules)
+        self.tricks_won[winner] += 1
+        self.history[-1] = (card, self.history[-1][1], (trick, self.leader))
+        self.leader = winner
+        self.trick = []
+        self.round_num += 1
+        return winner
+
+    # take back the last card applied
+    def undo(self):
+        card, heart_broken, finished = self.history.pop()
+        self.heart_broken = heart_broken
+
+        # put the finished trick back before taking its last card out
+        if finished is not None:
+            trick, leader = finished
+            winner = self.leader
+            mask = (1 << trick[0]) | (1 << trick[1]) | (1 << trick[2]) | (1 << trick[3])
+            self.won[winner] &= ~mask
+            self.taken[winner] -= trick_points(mask, self.rules)
+            self.tricks_won[winner] -= 1
+            self.leader = leader
+            self.trick = trick
+            self.round_num -= 1
+
+        self.trick.pop()
+        bit = 1 << card
+        self.played &= ~bit
+        self.hands[(self.leader + len(self.trick)) % 4] |= bit
+
+# penalty points of a mask of cards under a Rules.Variant, 1 for each heart and 13 for the queen of spades in the standard game
+def trick_points(mask, rules=STANDARD):
+    return rules.points(mask)
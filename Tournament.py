@@ -0,0 +1,178 @@
+from Engine import GameEngine, GameListener
+from Rules import POINT_LIMIT
+from Bot import DecisionCache, DECISION_CACHE_SIZE
+from Player import Player
+from Bitmask import QS_BIT
+from Instrument import STATS, enable
+from multiprocessing import Pool
+import argparse
+import random
+import os
+import time
+
+# number of games each worker plays before sending its totals back
+CHUNK_SIZE = 250
+
+# index of each total kept per difficulty
+SEATS, WINS, POINTS, HANDS, MOONS, QUEENS = range(6)
+
+# each worker keeps one decision cache for every game it plays, None when caching is turned off
+worker_cache = None
+
+# listener which counts tricks won, moons and queen of spades captures for each seat
+class HandStats(GameListener):
+    # initialise the counters
+    def __init__(self):
+        self.tricks = [0, 0, 0, 0]
+        self.moons = [0, 0, 0, 0]
+        self.queens = [0, 0, 0, 0]
+        self.hands = 0
+
+    # count the trick, then check the trick piles after the last trick, before they are scored and reset
+    def on_trick(self, engine, seat):
+        self.tricks[seat] += 1
+        if engine.round_num != 13:
+            return
+
+        self.hands += 1
+        for i, player in enumerate(engine.players):
+            if player.trick_mask & QS_BIT:
+                self.queens[i] += 1
+            if player.shot_the_moon():
+                self.moons[i] += 1
+
+# create a seed for a single game from the tournament seed, so results don't depend on how games are split between workers
+def game_seed(seed, index):
+    return seed * 1000003 + index
+
+# play one full game with the given bot difficulty in each seat, returns the players and their hand stats
+# an iterator of pre-made deals can be given to replay the same hands (see Deals.py), and a DecisionCache shared with other games
+def play_game(seats, seed, point_limit=POINT_LIMIT, deals=None, decision_cache=None):
+    players = [Player(f'Bot {i+1}', True) for i in range(len(seats))]
+    for player, difficulty in zip(players, seats):
+        player.set_difficulty(difficulty)
+
+    stats = HandStats()
+    winners = GameEngine(players, listeners=[stats], point_limit=point_limit, rng=random.Random(seed), deals=deals, decision_cache=decision_cache).play_game()
+
+    return players, winners, stats
+
+# create an empty set of totals for each difficulty used
+def empty_totals(seats):
+    return {difficulty: [0] * 6 for difficulty in set(seats)}
+
+# add the totals of one set into another
+def merge_totals(totals, other):
+    for difficulty, values in other.items():
+        for i, value in enumerate(values):
+            totals[difficulty][i] += value
+
+# get the line-ups to play each game with, in duplicate mode the same deals are played once for each rotation of the seats
+def get_lineups(seats, duplicate):
+    if not duplicate:
+        return [seats]
+    return [seats[shift:] + seats[:shift] for shift in range(len(seats))]
+
+# play a range of games and return totals per difficulty, this is run in the worker processes
+def play_games(job):
+    global worker_cache
+    seats, seed, start, stop, point_limit, duplicate, record_stats, cache_size = job
+    totals = empty_totals(seats)
+
+    # the cache is kept between jobs so later games reuse the decisions of earlier ones
+    if not cache_size:
+        worker_cache = None
+    elif worker_cache is None or worker_cache.max_size != cache_size:
+        worker_cache = DecisionCache(cache_size)
+    hits, misses = (worker_cache.hits, worker_cache.misses) if worker_cache else (0, 0)
+
+    # workers are reused between jobs so the instruments are cleared each time
+    enable(record_stats)
+    STATS.reset()
+
+    # numpy is only needed for the duplicate deals
+    if duplicate:
+        from Deals import deal_stream
+
+    for index in range(start, stop):
+        for lineup in get_lineups(seats, duplicate):
+            deals = deal_stream(game_seed(seed, index)) if duplicate else None
+            players, winners, stats = play_game(lineup, game_seed(seed, index), point_limit, deals, worker_cache)
+            add_game_totals(totals, lineup, players, winners, stats)
+
+    if worker_cache:
+        hits, misses = worker_cache.hits - hits, worker_cache.misses - misses
+    return totals, STATS if STATS.enabled else None, (hits, misses)
+
+# add the results of one game to the totals
+def add_game_totals(totals, seats, players, winners, stats):
+    # a drawn game is shared between every winner
+    for i, (player, difficulty) in enumerate(zip(players, seats)):
+        values = totals[difficulty]
+        values[SEATS] += 1
+        values[WINS] += 1 / len(winners) if player in winners else 0
+        values[POINTS] += player.points
+        values[HANDS] += stats.hands
+        values[MOONS] += stats.moons[i]
+        values[QUEENS] += stats.queens[i]
+
+# play a number of games across a pool of worker processes and return totals per difficulty
+# if stats is True the workers' instruments are merged into STATS
+# cache_size is the number of bot decisions each worker caches (see Bot.DecisionCache), 0 turns the cache off
+# returns the totals and the number of decision cache hits and misses
+def run_tournament(games, seats, seed=0, processes=None, point_limit=POINT_LIMIT, duplicate=False, stats=False, cache_size=0):
+    jobs = [(seats, seed, start, min(start + CHUNK_SIZE, games), point_limit, duplicate, stats, cache_size) for start in range(0, games, CHUNK_SIZE)]
+    totals = empty_totals(seats)
+    cache = [0, 0]
+
+    with Pool(processes) as pool:
+        for result, instruments, (hits, misses) in pool.imap_unordered(play_games, jobs):
+            merge_totals(totals, result)
+            cache[0] += hits
+            cache[1] += misses
+            if instruments is not None:
+                STATS.merge(instruments)
+
+    return totals, cache
+
+# display the totals for each difficulty
+def display_totals(totals):
+    print(f"\n{'Difficulty':<12}{'Seats':>10}{'Win rate':>10}{'Mean pts':>10}{'Moons/hand':>12}{'QS/hand':>10}")
+
+    for difficulty, values in sorted(totals.items()):
+        seats, hands = values[SEATS], values[HANDS] or 1
+        print(f"{difficulty:<12}{seats:>10}{values[WINS] / seats:>10.3f}{values[POINTS] / seats:>10.2f}{values[MOONS] / hands:>12.4f}{values[QUEENS] / hands:>10.4f}")
+    print('')
+
+# read the command line options and run a tournament
+def main():
+    parser = argparse.ArgumentParser(description='Play bots against each other and compare difficulties.')
+    parser.add_argument('--games', type=int, default=1000, help='number of games to play')
+    parser.add_argument('--seats', default='0,1,2,3', help='difficulty of the bot in each seat, e.g. 3,3,2,1')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='seed used to make the deals reproducible')
+    parser.add_argument('--point-limit', type=int, default=POINT_LIMIT, help='points which end a game')
+    parser.add_argument('--stats', action='store_true', help='record and display latencies and counters for the run')
+    parser.add_argument('--duplicate', action='store_true', help='replay each game\'s deals once for every rotation of the seats (needs numpy)')
+    parser.add_argument('--cache', type=int, nargs='?', const=DECISION_CACHE_SIZE, default=0, metavar='SIZE', help=f'cache up to SIZE bot decisions in each worker (default {DECISION_CACHE_SIZE})')
+    args = parser.parse_args()
+
+    seats = [int(difficulty) for difficulty in args.seats.split(',')]
+    if len(seats) != 4 or any(difficulty not in range(6) for difficulty in seats):
+        parser.error('--seats needs 4 difficulties between 0 and 5')
+
+    start = time.perf_counter()
+    totals, (hits, misses) = run_tournament(args.games, seats, args.seed, args.processes, args.point_limit, args.duplicate, args.stats, args.cache)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nPlayed {args.games} games in {elapsed:.2f}s ({args.games / elapsed:.0f} games/s)")
+    if hits + misses:
+        print(f'Decision cache: {hits / (hits + misses):.1%} of {hits + misses} decisions found')
+    display_totals(totals)
+
+    if args.stats:
+        STATS.dump()
+
+
+if __name__ == "__main__":
+    main()
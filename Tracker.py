@@ -0,0 +1,128 @@
+from Bitmask import SUIT_BITS, FULL_MASK, QS_BIT, indexes_from_mask, popcount
+
+# what everyone at the table knows about a hand from the cards played so far, updated once for each card played
+# bots use it to see which cards are still out, who can't have a suit and where the queen of spades can be,
+# and to deal the unseen cards in a way that agrees with all of that
+#
+# suits are numbered as in Bitmask.py: 0 clubs, 1 diamonds, 2 spades, 3 hearts
+
+SPADES = 2
+HEARTS = 3
+
+# voids mask with every suit but hearts, a player who leads a heart before hearts are broken can only have hearts
+ALL_BUT_HEARTS = 0b0111
+
+# how many times the sampler tries to deal before giving up on the voids
+MAX_ATTEMPTS = 20
+
+class CardTracker():
+    # initialise for a new hand
+    def __init__(self):
+        self.reset()
+
+    # forget everything ready for a new hand
+    def reset(self):
+        self.played = 0
+        self.counts = [13, 13, 13, 13]
+        self.voids = [0, 0, 0, 0]
+        self.qs_played_by = None
+
+    # record a card played, lead_suit is the suit number of the trick's first card or None if this card leads
+    # heart_broken is False only while hearts can't be led, so a heart led then shows the player holds nothing else
+    def update(self, seat, index, lead_suit=None, heart_broken=True):
+        self.played |= 1 << index
+        self.counts[seat] -= 1
+        suit = index // 13
+
+        # not following suit shows the player has none of it
+        if lead_suit is not None and suit != lead_suit:
+            self.voids[seat] |= 1 << lead_suit
+
+        # hearts can only be led before they are broken by a player holding nothing else
+        if lead_suit is None and suit == HEARTS and not heart_broken:
+            self.voids[seat] |= ALL_BUT_HEARTS
+
+        if index == 36:
+            self.qs_played_by = seat
+
+    # check if a seat is known to have none of a suit
+    def is_void(self, seat, suit):
+        return bool(self.voids[seat] >> suit & 1)
+
+    # mask of the cards the given seat hasn't seen, the cards held by everyone else
+    def unseen(self, seat, own_hand):
+        return FULL_MASK & ~self.played & ~own_hand
+
+    # seat known to hold the queen of spades from the given seat's point of view, or None if it isn't known or has been played
+    def qs_holder(self, seat, own_hand):
+        if own_hand & QS_BIT:
+            return seat
+        if self.played & QS_BIT:
+            return None
+
+        # if only one other seat can still have spades, it has the queen
+        others = [other for other in range(4) if other != seat and self.counts[other] and not self.is_void(other, SPADES)]
+        return others[0] if len(others) == 1 else None
+
+    # deal the cards the given seat hasn't seen to the other seats, each gets the number of cards it holds and no cards of its voids
+    def sample_hands(self, seat, own_hand, rng):
+        return deal_unseen(seat, own_hand, self.unseen(seat, own_hand), self.counts, self.voids, rng)
+
+# deal unseen cards to every seat but the given one, keeping to the counts each seat holds and their known voids
+# if no deal fitting the voids is found after a few attempts the voids are ignored
+def deal_unseen(seat, own_hand, unseen, counts, voids, rng):
+    others = [other for other in range(4) if other != seat]
+
+    # suits the fewest seats can hold are dealt first so those seats don't run out of room
+    suits = sorted(range(4), key=lambda suit: sum(not voids[other] >> suit & 1 for other in others))
+    for _ in range(MAX_ATTEMPTS):
+        hands = try_deal(seat, own_hand, unseen, counts, voids, others, suits, rng)
+        if hands is not None:
+            return hands
+
+    # the voids can't be kept to (they always can be in a real game, so this only happens with odd inputs)
+    return try_deal(seat, own_hand, unseen, counts, [0, 0, 0, 0], others, suits, rng)
+
+# make one attempt at dealing the unseen cards, returns None if a seat is left without enough cards it can hold
+# each card goes to a seat chosen in proportion to the room it has left, which is close to dealing evenly among the deals which fit,
+# unless a seat needs every card left that it can hold, then it gets them
+def try_deal(seat, own_hand, unseen, counts, voids, others, suits, rng):
+    hands = [0, 0, 0, 0]
+    hands[seat] = own_hand
+    room = list(counts)
+
+    # number of cards still to deal which each seat could hold
+    available = [0, 0, 0, 0]
+    for other in others:
+        for suit in range(4):
+            if not voids[other] >> suit & 1:
+                available[other] += popcount(unseen & (SUIT_BITS << (suit * 13)))
+
+    for suit in suits:
+        cards = unseen & (SUIT_BITS << (suit * 13))
+        if not cards:
+            continue
+        holders = [other for other in others if not voids[other] >> suit & 1]
+
+        for index in indexes_from_mask(cards):
+            tight = [holder for holder in holders if room[holder] and room[holder] == available[holder]]
+            if tight:
+                holder = tight[0]
+            else:
+                total = sum(room[other] for other in holders)
+                if not total:
+                    return None
+                pick = rng.randrange(total)
+                for holder in holders:
+                    pick -= room[holder]
+                    if pick < 0:
+                        break
+
+            hands[holder] |= 1 << index
+            room[holder] -= 1
+            for other in holders:
+                available[other] -= 1
+                if available[other] < room[other]:
+                    return None
+
+    return hands
@@ -0,0 +1,34 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from BatchSim import BatchSimulator, check_against_engine
+from Rules import Variant, PASS_CYCLE
+
+# every game of a batch must end with the same points as GameEngine playing the same deals with the same random numbers
+@pytest.mark.parametrize('seats', [(0, 0, 0, 0), (1, 1, 1, 1), (2, 2, 2, 2), (0, 1, 2, 1), (2, 0, 1, 0)])
+def test_batch_matches_engine(seats):
+    sim = BatchSimulator(60, seats, seed=1)
+    sim.run()
+    assert check_against_engine(sim, 60) == []
+
+def test_learned_batch_matches_engine():
+    sim = BatchSimulator(8, (5, 0, 1, 2), seed=2)
+    sim.run()
+    assert check_against_engine(sim, 8) == []
+
+def test_point_limit_of_variant():
+    sim = BatchSimulator(30, (1, 2, 0, 1), seed=3, rules=Variant(point_limit=40))
+    points = sim.run()
+    assert (points.max(axis=1) >= 40).all()
+    assert check_against_engine(sim, 30) == []
+
+def test_same_seed_same_games():
+    first = BatchSimulator(20, (0, 1, 2, 0), seed=4).run()
+    assert (BatchSimulator(20, (0, 1, 2, 0), seed=4).run() == first).all()
+
+def test_rejects_unsupported_games():
+    with pytest.raises(ValueError):
+        BatchSimulator(10, (3, 1, 1, 1))
+    with pytest.raises(ValueError):
+        BatchSimulator(10, (1, 1, 1, 1), rules=Variant(passing=PASS_CYCLE))
@@ -0,0 +1,62 @@
+from Bot import DecisionCache, make_choice
+from Engine import GameEngine
+from Player import Player
+from Rules import Variant
+import random
+import pytest
+
+# play games where every bot decision is made both through the cache and by make_choice, returns the decisions which differ
+def cached_games(cache, games, rules=None):
+    mismatches = []
+
+    # agent which checks the cached decision against make_choice before playing it
+    def checking_agent(engine, seat):
+        player = engine.players[seat]
+        args = (player, engine.round_num, engine.lead_suit, engine.heart_broken, engine.first_play, engine.current_trick)
+        chosen = make_choice(*args, rng=engine.rng, rules=engine.rules)
+        if player.difficulty:
+            cached = cache.choose(*args, rules=engine.rules)
+            if cached != chosen:
+                mismatches.append((player.difficulty, player.hand_mask, engine.current_trick[:], cached, chosen))
+        return chosen
+
+    for game in range(games):
+        players = [Player(f'Bot {i+1}', True) for i in range(4)]
+        for player, difficulty in zip(players, (game % 4, 1, 2, 3)):
+            player.set_difficulty(difficulty)
+        GameEngine(players, [checking_agent] * 4, rng=random.Random(game), rules=rules).play_game()
+    return mismatches
+
+def test_cache_hits_match_make_choice():
+    cache = DecisionCache()
+    assert cached_games(cache, 40) == []
+    assert cache.hits > 0 and cache.misses > 0
+
+@pytest.mark.parametrize('rules', [Variant(jack_diamonds=True), Variant(hearts_lead=True)])
+def test_variants_share_a_cache(rules):
+    cache = DecisionCache()
+    assert cached_games(cache, 20) == []
+    assert cached_games(cache, 20, rules) == []
+
+def test_small_cache_stays_bounded():
+    cache = DecisionCache(50)
+    assert cached_games(cache, 10) == []
+    assert len(cache) == 50
+
+def test_engine_with_cache_plays_the_same_games():
+    for game in range(20):
+        results = []
+        for cache in (None, DecisionCache()):
+            players = [Player(f'Bot {i+1}', True) for i in range(4)]
+            for player, difficulty in zip(players, (0, 1, 2, 3)):
+                player.set_difficulty(difficulty)
+            GameEngine(players, rng=random.Random(game), decision_cache=cache).play_game()
+            results.append([player.points for player in players])
+        assert results[0] == results[1]
+
+def test_random_bots_are_not_cached():
+    cache = DecisionCache()
+    bot = Player('Bot', True)
+    bot.set_hand(0b111 << 13)
+    cache.choose(bot, 2, 'C', False, False, [], rng=random.Random(1))
+    assert len(cache) == 0
@@ -0,0 +1,65 @@
+from Endgame import solve, solve_choice, final_points, TranspositionTable
+from State import GameState
+from Bitmask import indexes_from_mask
+import random
+import pytest
+
+# deal at random and play random legal cards until tricks are left, with cards already played to the current trick
+def random_position(rng, tricks, in_trick):
+    deck = list(range(52))
+    rng.shuffle(deck)
+    hands = [sum(1 << index for index in deck[seat * 13:seat * 13 + 13]) for seat in range(4)]
+    state = GameState(hands)
+    while 14 - state.round_num > tricks or len(state.trick) < in_trick:
+        state.apply(rng.choice(indexes_from_mask(state.legal_moves())))
+    state.history = []
+    return state
+
+# final points of root after every way of playing out the rest of the hand, root plays to take the fewest and the others the most
+def brute_force(state, root):
+    if state.hand_over():
+        return final_points(state.taken, root)
+
+    seat = state.turn
+    values = []
+    for index in indexes_from_mask(state.legal_moves()):
+        state.apply(index)
+        values.append(brute_force(state, root))
+        state.undo()
+    return min(values) if seat == root else max(values)
+
+# the arguments solve and solve_choice take for a state
+def solve_args(state):
+    return state.hands[:], state.won[:], state.trick[:], state.leader, state.round_num, state.heart_broken
+
+@pytest.mark.parametrize('seed', range(40))
+def test_solve_matches_brute_force(seed):
+    rng = random.Random(seed)
+    state = random_position(rng, rng.choice((2, 3, 4)), rng.randrange(4))
+    root = state.turn
+    candidates = indexes_from_mask(state.legal_moves())
+
+    expected = []
+    for index in candidates:
+        state.apply(index)
+        expected.append(brute_force(state, root))
+        state.undo()
+
+    values = solve(*solve_args(state), candidates, TranspositionTable(), max_nodes=10 ** 9, time_budget=100)
+    assert values == expected
+
+    # the chosen card must be one of the best
+    choice = solve_choice(*solve_args(state), TranspositionTable(), max_nodes=10 ** 9, time_budget=100)
+    assert expected[candidates.index(choice)] == min(expected)
+
+def test_shared_table_gives_the_same_values():
+    rng = random.Random(100)
+    table = TranspositionTable()
+    for _ in range(20):
+        state = random_position(rng, 3, rng.randrange(4))
+        fresh = solve(*solve_args(state), table=TranspositionTable(), max_nodes=10 ** 9, time_budget=100)
+        assert solve(*solve_args(state), table=table, max_nodes=10 ** 9, time_budget=100) == fresh
+
+def test_budget_runs_out():
+    state = random_position(random.Random(7), 8, 0)
+    assert solve(*solve_args(state), table=TranspositionTable(), max_nodes=10, time_budget=100) is None
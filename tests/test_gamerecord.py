@@ -0,0 +1,92 @@
+from GameRecord import RecordWriter, RecordReader, encode_record, decode_deal, replay, trick_winners, record_points, RECORD_SIZE, DEAL_SIZE
+from Engine import GameEngine, GameListener
+from Player import Player
+from Rules import Variant
+import random
+import pytest
+
+# listener which keeps everything a record should hold, to compare with what is read back
+class HandLog(GameListener):
+    # initialise with no hands
+    def __init__(self):
+        self.hands = []
+
+    # start a hand with the deal and the points before it
+    def on_deal(self, engine):
+        self.hands.append({'deal': [player.hand_mask for player in engine.players], 'plays': [], 'winners': [],
+                           'before': [player.points for player in engine.players]})
+
+    # add the seat and card index of a play
+    def on_play(self, engine, seat, card):
+        self.hands[-1]['plays'].append((seat, card.index))
+
+    # add the winner of a trick
+    def on_trick(self, engine, seat):
+        self.hands[-1]['winners'].append(seat)
+
+    # keep the points the hand added to each seat
+    def on_hand_end(self, engine):
+        hand = self.hands[-1]
+        hand['points'] = [player.points - before for player, before in zip(engine.players, hand['before'])]
+
+# play games writing their records to path, returns the hands as the games saw them
+def record_games(path, games, rules=None):
+    log = HandLog()
+    with RecordWriter(path) as writer:
+        for game in range(games):
+            players = [Player(f'Bot {i+1}', True) for i in range(4)]
+            for player, difficulty in zip(players, (0, 1, 2, 3)):
+                player.set_difficulty(difficulty)
+            GameEngine(players, listeners=[writer, log], rng=random.Random(game), rules=rules).play_game()
+    return log.hands
+
+@pytest.mark.parametrize('rules', [None, Variant(jack_diamonds=True)])
+def test_records_round_trip(tmp_path, rules):
+    path = tmp_path / 'hands.bin'
+    hands = record_games(path, 3, rules)
+
+    # records are copied out of the reader as it can't be closed while slices of the file are held
+    with RecordReader(path) as reader:
+        records = [bytes(record) for record in reader]
+        columns = [reader.points_column(seat).tolist() for seat in range(4)]
+        assert bytes(reader[-1]) == records[-1]
+
+    assert len(records) == len(hands)
+    for record, hand in zip(records, hands):
+        assert len(record) == RECORD_SIZE
+        assert decode_deal(record[:DEAL_SIZE]) == hand['deal']
+        assert replay(record) == hand['plays']
+        assert trick_winners(record) == hand['winners']
+        assert record_points(record) == hand['points']
+        assert record == encode_record(hand['deal'], [index for _, index in hand['plays']], hand['points'])
+
+    for seat in range(4):
+        assert columns[seat] == [hand['points'][seat] for hand in hands]
+
+def test_jack_of_diamonds_records_negative_points(tmp_path):
+    hands = record_games(tmp_path / 'hands.bin', 3, Variant(jack_diamonds=True))
+    assert any(min(hand['points']) < 0 for hand in hands)
+    with RecordReader(tmp_path / 'hands.bin') as reader:
+        assert min(min(reader.points_column(seat)) for seat in range(4)) < 0
+
+def test_appending_keeps_one_header(tmp_path):
+    path = tmp_path / 'hands.bin'
+    first = record_games(path, 1)
+    second = record_games(path, 1)
+    with RecordReader(path) as reader:
+        assert len(reader) == len(first) + len(second)
+        assert [bytes(record) for record in reader][len(first):] == [
+            encode_record(hand['deal'], [index for _, index in hand['plays']], hand['points']) for hand in second]
+
+def test_reader_refuses_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a record file')
+    with pytest.raises(ValueError):
+        RecordReader(path)
+
+def test_reader_index_out_of_range(tmp_path):
+    path = tmp_path / 'hands.bin'
+    hands = record_games(path, 1)
+    with RecordReader(path) as reader:
+        with pytest.raises(IndexError):
+            reader[len(hands)]
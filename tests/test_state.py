@@ -0,0 +1,125 @@
+from State import GameState
+from Engine import GameEngine, GameListener
+from Player import Player
+from Rules import STANDARD, Variant
+from Bitmask import indexes_from_mask
+import random
+import pytest
+
+# every slot of a state apart from the undo history, copied so later moves can't change it
+def snapshot(state):
+    return (state.hands[:], state.won[:], state.taken[:], state.tricks_won[:], state.points[:], state.trick[:], state.leader,
+            state.round_num, state.heart_broken, state.played, state.rules)
+
+# a state for a random deal
+def random_state(rng, rules=STANDARD):
+    deck = list(range(52))
+    rng.shuffle(deck)
+    return GameState([sum(1 << index for index in deck[seat * 13:seat * 13 + 13]) for seat in range(4)], points=(5, 0, 12, 3), rules=rules)
+
+@pytest.mark.parametrize('rules', [STANDARD, Variant(jack_diamonds=True), Variant(hearts_lead=True)])
+def test_undo_restores_every_move(rules):
+    rng = random.Random(1)
+    for _ in range(20):
+        state = random_state(rng, rules)
+        start = snapshot(state)
+        before = []
+
+        # each card is taken back and played again, so every undo is checked against the state just before its move
+        while not state.hand_over():
+            before.append(snapshot(state))
+            card = rng.choice(indexes_from_mask(state.legal_moves()))
+            state.apply(card)
+            after = snapshot(state)
+            state.undo()
+            assert snapshot(state) == before[-1]
+            state.apply(card)
+            assert snapshot(state) == after
+
+        assert sum(state.tricks_won) == 13
+        assert state.hands == [0, 0, 0, 0]
+        assert state.taken == [rules.points(mask) for mask in state.won]
+
+        # then the whole hand is taken back
+        while before:
+            state.undo()
+            assert snapshot(state) == before.pop()
+        assert snapshot(state) == start
+        assert state.history == []
+
+def test_clone_is_independent():
+    rng = random.Random(2)
+    state = random_state(rng)
+    for _ in range(10):
+        state.apply(rng.choice(indexes_from_mask(state.legal_moves())))
+
+    copy = state.clone()
+    assert snapshot(copy) == snapshot(state)
+    assert copy.key() == state.key()
+    assert copy.history == []
+
+    kept = snapshot(state)
+    while not copy.hand_over():
+        copy.apply(rng.choice(indexes_from_mask(copy.legal_moves())))
+    assert snapshot(state) == kept
+
+    # the original can still take back its own moves
+    state.undo()
+    assert len(state.history) == 9
+
+def test_to_players_round_trip():
+    rng = random.Random(3)
+    state = random_state(rng)
+    while state.round_num < 6:
+        state.apply(rng.choice(indexes_from_mask(state.legal_moves())))
+
+    players = [Player(f'Bot {i+1}', True) for i in range(4)]
+    state.to_players(players)
+    copy = GameState.from_players(players, state.leader, state.round_num, state.heart_broken)
+    assert snapshot(copy) == snapshot(state)
+
+# listener which applies every card to its own state and checks GameState.from_engine gives the same state at each event
+class FromEngineCheck(GameListener):
+    # initialise with no state and no differences
+    def __init__(self):
+        self.state = None
+        self.checks = 0
+        self.differences = []
+
+    # compare the state built from the engine with the one kept by applying cards, the game points aren't kept so they are left out
+    def check(self, engine, event):
+        self.checks += 1
+        built = snapshot(GameState.from_engine(engine))
+        kept = snapshot(self.state)
+        if built[:4] + built[5:] != kept[:4] + kept[5:]:
+            self.differences.append((event, built, kept))
+
+    # start a new state from the deal
+    def on_deal(self, engine):
+        self.state = GameState([player.hand_mask for player in engine.players], rules=engine.rules)
+        self.check(engine, 'deal')
+
+    # check before each turn
+    def on_turn(self, engine, seat):
+        self.check(engine, 'turn')
+
+    # play the card on the kept state, a fourth card is checked before the engine gives the trick to its winner
+    def on_play(self, engine, seat, card):
+        self.state.apply(card.index)
+        self.check(engine, 'play')
+
+    # check once the winner has the trick
+    def on_trick(self, engine, seat):
+        self.check(engine, 'trick')
+
+@pytest.mark.parametrize('rules', [STANDARD, Variant(jack_diamonds=True)])
+def test_from_engine_at_every_event(rules):
+    listener = FromEngineCheck()
+    for game in range(6):
+        players = [Player(f'Bot {i+1}', True) for i in range(4)]
+        for player in players:
+            player.set_difficulty(game % 4)
+        GameEngine(players, listeners=[listener], rng=random.Random(game), rules=rules).play_game()
+
+    assert listener.checks > 0
+    assert listener.differences == []